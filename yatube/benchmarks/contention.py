@@ -0,0 +1,198 @@
+"""Нагрузка на SQLite несколькими процессами.
+
+Писатели по очереди создают посты и комментарии (как post_create и
+add_comment), читатели выбирают первую страницу ленты. Каждый профиль
+прагм замеряется на своей копии основной базы: режим журнала хранится
+в файле и не должен достаться следующему прогону.
+
+Процессы запускаются через spawn и сами настраивают Django, поэтому
+модели импортируются внутри функций.
+"""
+import multiprocessing
+import os
+import queue
+import sqlite3
+import tempfile
+import time
+
+import django
+from django.conf import settings
+from django.db import OperationalError, connections, transaction
+
+ROLES = ('write', 'read')
+
+# Секунд на запуск процесса и настройку Django в нём
+STARTUP_TIMEOUT = 60
+
+# Сколько авторов и постов берут писатели
+SAMPLE_SIZE = 100
+
+
+def profiles():
+    """Профили прагм: без настройки (как было) и SQLITE_PRAGMAS."""
+    return {'baseline': {}, 'tuned': dict(settings.SQLITE_PRAGMAS)}
+
+
+def sample_ids():
+    from posts.models import Post, User
+
+    user_ids = list(
+        User.objects.order_by('pk').values_list('pk', flat=True)[
+            :SAMPLE_SIZE
+        ]
+    )
+    post_ids = list(Post.objects.values_list('pk', flat=True)[:SAMPLE_SIZE])
+    if not user_ids or not post_ids:
+        raise ValueError('В базе нет постов, сначала seed_benchmark.')
+    return user_ids, post_ids
+
+
+def prepare(path):
+    """Копия основной базы в path с журналом SQLite по умолчанию."""
+    connection = connections['default']
+    connection.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        connection.connection.backup(target)
+        target.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        target.close()
+
+
+def write(number, user_ids, post_ids):
+    from posts.models import Comment, Post
+
+    author_id = user_ids[number % len(user_ids)]
+    with transaction.atomic():
+        if number % 2:
+            Comment.objects.create(
+                post_id=post_ids[number % len(post_ids)],
+                author_id=author_id,
+                text=f'Contention comment {number}',
+            )
+        else:
+            Post.objects.create(
+                author_id=author_id, text=f'Contention post {number}'
+            )
+
+
+def read(number, user_ids, post_ids):
+    from posts.models import Post
+
+    list(Post.objects.select_related('author', 'group')[
+        :settings.NUMBER_OF_POST
+    ])
+
+
+OPERATIONS = {'write': write, 'read': read}
+
+
+def run_worker(role, path, pragmas, duration, ids, barrier, results):
+    """Один процесс нагрузки; результат кладёт в очередь results."""
+    django.setup()
+    settings.SQLITE_PRAGMAS = pragmas
+    connections['default'].settings_dict['NAME'] = path
+    operation = OPERATIONS[role]
+    latencies = []
+    errors = 0
+    number = os.getpid()
+    barrier.wait(STARTUP_TIMEOUT)
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        number += 1
+        start = time.perf_counter()
+        try:
+            operation(number, *ids)
+        except OperationalError:
+            # «database is locked»: именно эти ошибки и считаем.
+            errors += 1
+        else:
+            latencies.append(time.perf_counter() - start)
+    connections.close_all()
+    results.put({'role': role, 'latencies': latencies, 'errors': errors})
+
+
+def summary(collected, duration):
+    from .runner import percentiles
+
+    result = {}
+    for role in ROLES:
+        latencies = [
+            latency
+            for item in collected if item['role'] == role
+            for latency in item['latencies']
+        ]
+        result[role] = {
+            'per_second': len(latencies) / duration,
+            'errors': sum(
+                item['errors'] for item in collected if item['role'] == role
+            ),
+            **(percentiles(latencies) if latencies else {}),
+        }
+    return result
+
+
+def run_profile(path, pragmas, ids, writers, readers, duration):
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(writers + readers)
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=run_worker,
+            args=(role, path, pragmas, duration, ids, barrier, results),
+        )
+        for role in ('write',) * writers + ('read',) * readers
+    ]
+    for process in processes:
+        process.start()
+    try:
+        collected = [
+            results.get(timeout=STARTUP_TIMEOUT + duration)
+            for _ in processes
+        ]
+    except queue.Empty:
+        raise RuntimeError('Процесс нагрузки не вернул результат.')
+    finally:
+        for process in processes:
+            process.join(STARTUP_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+    return summary(collected, duration)
+
+
+def run(writers=4, readers=4, duration=5.0, log=print):
+    if connections['default'].vendor != 'sqlite':
+        raise ValueError('Замер рассчитан на SQLite.')
+    ids = sample_ids()
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, pragmas in profiles().items():
+            log(name)
+            path = os.path.join(directory, f'{name}.sqlite3')
+            prepare(path)
+            results[name] = run_profile(
+                path, pragmas, ids, writers, readers, duration
+            )
+    return {
+        'meta': {
+            'writers': writers,
+            'readers': readers,
+            'duration': duration,
+            'pragmas': profiles(),
+        },
+        'profiles': results,
+    }
+
+
+def report(results):
+    """Строки сравнения профилей по пропускной способности."""
+    for name, result in results['profiles'].items():
+        parts = []
+        for role in ROLES:
+            stats = result[role]
+            parts.append(
+                f'{role} {stats["per_second"]:.1f}/с, '
+                f'ошибок {stats["errors"]}, '
+                f'p95 {stats.get("p95", 0):.1f} мс'
+            )
+        yield f'{name}: ' + '; '.join(parts)
@@ -0,0 +1,73 @@
+"""Замер подготовки картинок постов (posts.images).
+
+Для каждого файла считаются размер до и после и время обработки.
+Без файлов замеряются синтетические «фото с телефона»: 4000×3000,
+JPEG с качеством 95 и EXIF.
+"""
+import os
+import statistics
+import time
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image
+
+from posts.images import encode
+
+
+def synthetic_photos(count, size=(4000, 3000)):
+    """(имя, байты) синтетических фото: градиент с шумом, как у камеры."""
+    width, height = size
+    gradient = Image.linear_gradient('L').resize(size)
+    for number in range(count):
+        noise = Image.effect_noise(size, 20 + number)
+        image = Image.merge('RGB', (
+            gradient, noise, gradient.rotate(90, expand=False),
+        ))
+        exif = Image.Exif()
+        exif[0x010F] = 'Phone'  # Make
+        exif[0x0112] = 6  # Orientation
+        buffer = BytesIO()
+        image.save(buffer, 'JPEG', quality=95, exif=exif.tobytes())
+        yield f'synthetic-{number}.jpg', buffer.getvalue()
+
+
+def files(paths):
+    for path in paths:
+        with open(path, 'rb') as file:
+            yield os.path.basename(path), file.read()
+
+
+def measure(images):
+    results = []
+    for name, data in images:
+        start = time.perf_counter()
+        encoded = encode(BytesIO(data))
+        elapsed = time.perf_counter() - start
+        if encoded is None:
+            continue
+        results.append({
+            'name': name,
+            'bytes_before': len(data),
+            'bytes_after': len(encoded),
+            'ms': elapsed * 1000,
+        })
+    before = sum(result['bytes_before'] for result in results)
+    after = sum(result['bytes_after'] for result in results)
+    return {
+        'meta': {
+            'format': settings.POST_IMAGE_FORMAT,
+            'quality': settings.POST_IMAGE_QUALITY,
+            'max_size': settings.POST_IMAGE_MAX_SIZE,
+        },
+        'images': results,
+        'total': {
+            'images': len(results),
+            'bytes_before': before,
+            'bytes_after': after,
+            'bytes_saved': before - after,
+            'ms_mean': statistics.mean(
+                result['ms'] for result in results
+            ) if results else 0,
+        },
+    }
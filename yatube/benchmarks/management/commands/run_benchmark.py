@@ -0,0 +1,43 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.runner import Benchmark, compare
+
+
+class Command(BaseCommand):
+    help = 'Замеряет маршруты posts и users и пишет результат в JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='benchmark.json',
+                            help='Файл для результатов.')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--username',
+                            help='Читатель; по умолчанию первый пользователь.')
+        parser.add_argument(
+            '--compare',
+            metavar='PREVIOUS',
+            help='JSON прошлого прогона для сравнения.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            benchmark = Benchmark(
+                iterations=options['iterations'],
+                warmup=options['warmup'],
+                username=options['username'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        results = benchmark.run(log=self.stdout.write)
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                previous = json.load(file)
+            for line in compare(previous, results):
+                self.stdout.write(line)
+        self.stdout.write(
+            self.style.SUCCESS(f'Результаты записаны в {options["output"]}')
+        )
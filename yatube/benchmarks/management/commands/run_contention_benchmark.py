@@ -0,0 +1,40 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.contention import report, run
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает SQLite параллельными процессами записи и чтения '
+        'без настройки соединений и с SQLITE_PRAGMAS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4,
+                            help='Процессов, создающих посты и комментарии.')
+        parser.add_argument('--readers', type=int, default=4,
+                            help='Процессов, читающих ленту.')
+        parser.add_argument('--duration', type=float, default=5.0,
+                            help='Секунд нагрузки на каждый профиль.')
+        parser.add_argument('--output', default='contention.json',
+                            help='Файл для результатов.')
+
+    def handle(self, *args, **options):
+        try:
+            results = run(
+                writers=options['writers'],
+                readers=options['readers'],
+                duration=options['duration'],
+                log=self.stdout.write,
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+        for line in report(results):
+            self.stdout.write(line)
+        self.stdout.write(
+            self.style.SUCCESS(f'Результаты записаны в {options["output"]}')
+        )
@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from benchmarks.images import files, measure, synthetic_photos
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет подготовку картинок постов: сколько байт она экономит '
+        'и сколько времени занимает на картинку.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help='Картинки; без них замеряются синтетические фото.',
+        )
+        parser.add_argument('--synthetic', type=int, default=5,
+                            help='Сколько синтетических фото создать.')
+        parser.add_argument('--output', default='images.json',
+                            help='Файл для результатов.')
+
+    def handle(self, *args, **options):
+        images = (
+            files(options['paths']) if options['paths']
+            else synthetic_photos(options['synthetic'])
+        )
+        results = measure(images)
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+        total = results['total']
+        before = total['bytes_before'] or 1
+        self.stdout.write(
+            f'Картинок: {total["images"]}, '
+            f'{total["bytes_before"]} -> {total["bytes_after"]} байт '
+            f'(-{100 * total["bytes_saved"] / before:.0f}%), '
+            f'{total["ms_mean"]:.0f} мс на картинку'
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Результаты записаны в {options["output"]}')
+        )
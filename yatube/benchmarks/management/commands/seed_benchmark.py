@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from benchmarks.seed import seed
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу пользователями, постами и подписками для замеров.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=float,
+            default=1.0,
+            help='Доля полного объёма: 100 тыс. пользователей, 5 млн постов, '
+                 '20 млн комментариев.',
+        )
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределены даты.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--timeline-users',
+            type=int,
+            default=100,
+            help='Скольким первым пользователям построить ленту подписок.',
+        )
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Зерно генератора случайных чисел.')
+
+    def handle(self, *args, **options):
+        counts = seed(
+            scale=options['scale'],
+            days=options['days'],
+            batch_size=options['batch_size'],
+            timeline_users=options['timeline_users'],
+            random_seed=options['seed'],
+            log=self.stdout.write,
+        )
+        for model, count in counts.items():
+            self.stdout.write(f'{model}: {count}')
+        self.stdout.write(self.style.SUCCESS('База заполнена'))
@@ -0,0 +1,217 @@
+"""Замеры маршрутов posts и users на заполненной базе.
+
+Каждый маршрут запрашивается тестовым клиентом от имени читателя
+внутри транзакции, которая затем откатывается, поэтому запросы на
+запись не меняют данные между прогонами. Для каждого маршрута
+считаются перцентили задержки, число SQL-запросов и число строк,
+которые вернули SELECT-запросы.
+"""
+import platform
+import statistics
+import subprocess
+import time
+from http.cookies import SimpleCookie
+
+import django
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from posts import urls as posts_urls
+from posts.models import Comment, Follow, Group, Post, User, UserCounters
+from users import urls as users_urls
+
+URLCONFS = (posts_urls, users_urls)
+
+# Маршруты, которые дополнительно замеряются POST-запросом
+POST_DATA = {
+    'posts:post_create': {'text': 'Benchmark post'},
+    'posts:post_edit': {'text': 'Benchmark edit'},
+    'posts:add_comment': {'text': 'Benchmark comment'},
+}
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def routes():
+    """Имена маршрутов вида namespace:name и их аргументы."""
+    for urlconf in URLCONFS:
+        for pattern in urlconf.urlpatterns:
+            if isinstance(pattern, URLPattern) and pattern.name:
+                yield (
+                    f'{urlconf.app_name}:{pattern.name}',
+                    list(pattern.pattern.converters),
+                )
+
+
+def fixtures(username=None):
+    """Значения аргументов маршрутов и пользователь-читатель."""
+    readers = User.objects.order_by('pk')
+    if username:
+        readers = readers.filter(username=username)
+    reader = readers.first()
+    if reader is None:
+        raise ValueError('В базе нет пользователей, сначала seed_benchmark.')
+    # Самый популярный автор — худший случай для профиля и подписок.
+    author = User.objects.filter(
+        pk__in=UserCounters.objects.order_by('-followers').values('user')[:1]
+    ).first() or reader
+    post = Post.objects.filter(author=author).order_by('-pub_date').first()
+    own_post = Post.objects.filter(author=reader).order_by('-pub_date')
+    group = Group.objects.filter(posts__isnull=False).order_by('pk').first()
+    values = {
+        'username': author.username,
+        'slug': group and group.slug,
+        'post_id': post and post.pk,
+        'uidb64': urlsafe_base64_encode(force_bytes(reader.pk)),
+        'token': default_token_generator.make_token(reader),
+        # Выгрузка доступна только персоналу, читатель получит редирект.
+        'table': 'posts',
+    }
+    return reader, values, own_post.first()
+
+
+def percentiles(samples):
+    if len(samples) < 2:
+        return {f'p{p}': samples[0] * 1000 for p in PERCENTILES}
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {f'p{p}': cuts[p - 1] * 1000 for p in PERCENTILES}
+
+
+def rows_read(queries):
+    """Сколько строк вернули SELECT-запросы из queries."""
+    total = 0
+    with connection.cursor() as cursor:
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            cursor.execute(f'SELECT COUNT(*) FROM ({sql})')
+            total += cursor.fetchone()[0]
+    return total
+
+
+class Benchmark:
+    def __init__(self, iterations=50, warmup=5, username=None):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.reader, self.values, self.own_post = fixtures(username)
+        self.client = Client(SERVER_NAME='localhost')
+        self.client.force_login(self.reader)
+        self.cookies = SimpleCookie(self.client.cookies)
+
+    def request(self, method, url, data):
+        """Один запрос в откатываемой транзакции, время в секундах."""
+        # logout и смена пароля сбрасывают сессию клиента.
+        self.client.cookies = SimpleCookie(self.cookies)
+        with transaction.atomic():
+            start = time.perf_counter()
+            response = getattr(self.client, method)(url, data)
+            elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        return response, elapsed
+
+    def profile(self, method, url, data):
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                self.client.cookies = SimpleCookie(self.cookies)
+                getattr(self.client, method)(url, data)
+            rows = rows_read(queries.captured_queries)
+            transaction.set_rollback(True)
+        return len(queries), rows
+
+    def measure(self, method, url, data=None):
+        for _ in range(self.warmup):
+            self.request(method, url, data)
+        samples = []
+        for _ in range(self.iterations):
+            response, elapsed = self.request(method, url, data)
+            samples.append(elapsed)
+        queries, rows = self.profile(method, url, data)
+        return {
+            'url': url,
+            'status': response.status_code,
+            **percentiles(samples),
+            'mean': statistics.mean(samples) * 1000,
+            'max': max(samples) * 1000,
+            'queries': queries,
+            'rows_read': rows,
+        }
+
+    def url(self, name, arguments):
+        values = dict(self.values)
+        if name == 'posts:post_edit':
+            values['post_id'] = self.own_post and self.own_post.pk
+        kwargs = {argument: values.get(argument) for argument in arguments}
+        if None in kwargs.values():
+            return None
+        return reverse(name, kwargs=kwargs)
+
+    def run(self, log=print):
+        results = {}
+        for name, arguments in routes():
+            url = self.url(name, arguments)
+            if url is None:
+                log(f'{name}: нет данных для аргументов, пропущен')
+                continue
+            log(name)
+            requests = [('get', None)]
+            if name in POST_DATA:
+                requests.append(('post', POST_DATA[name]))
+            for method, data in requests:
+                key = f'{method.upper()} {name}'
+                try:
+                    results[key] = self.measure(method, url, data)
+                except Exception as error:
+                    # Упавший маршрут не должен обрывать весь прогон.
+                    log(f'{key}: {error!r}')
+                    results[key] = {'url': url, 'error': repr(error)}
+        return {'meta': self.meta(), 'routes': results}
+
+    def meta(self):
+        return {
+            'commit': git_commit(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'iterations': self.iterations,
+            'warmup': self.warmup,
+            'reader': self.reader.username,
+            'rows': {
+                model.__name__: model.objects.count()
+                for model in (User, Group, Post, Comment, Follow)
+            },
+        }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(previous, current):
+    """Строки сравнения двух результатов по p50 и числу запросов."""
+    for name, result in current['routes'].items():
+        before = previous['routes'].get(name)
+        if before is None:
+            yield f'{name}: новый маршрут'
+            continue
+        if 'error' in before or 'error' in result:
+            yield f'{name}: {result.get("error", "ошибка исправлена")}'
+            continue
+        yield (
+            f'{name}: p50 {before["p50"]:.1f} -> {result["p50"]:.1f} мс, '
+            f'запросов {before["queries"]} -> {result["queries"]}, '
+            f'строк {before["rows_read"]} -> {result["rows_read"]}'
+        )
@@ -0,0 +1,252 @@
+"""Заполнение базы данными для бенчмарка.
+
+Пользователи и группы создаются через mixer, тексты постов и
+комментариев берутся из пула фраз Faker. Всё пишется bulk_create
+пачками, поэтому сигналы не срабатывают: счётчики, поисковый индекс
+и ленты подписок достраиваются отдельно в конце.
+"""
+import bisect
+import random
+from array import array
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from mixer.backend.django import Mixer
+
+from posts import search, timeline
+from posts.counters import user_counters_drift
+from posts.models import Comment, Follow, Group, Post, User, UserCounters
+
+# Объёмы при scale=1
+USERS = 100_000
+GROUPS = 1_000
+POSTS = 5_000_000
+COMMENTS = 20_000_000
+# Среднее число подписок на пользователя
+FOLLOWS_PER_USER = 20
+
+# Показатель степенного закона популярности авторов
+ZIPF_EXPONENT = 1.1
+# Параметр Парето для числа подписок одного пользователя
+PARETO_ALPHA = 1.5
+TEXTS_POOL = 1_000
+
+
+def scaled(value, scale):
+    return max(1, int(value * scale))
+
+
+def zipf_weights(count, exponent=ZIPF_EXPONENT, rng=random):
+    """Накопленные веса, у случайного k-го элемента вес 1 / k ** exponent."""
+    weights = array('d', (1 / rank ** exponent
+                          for rank in range(1, count + 1)))
+    rng.shuffle(weights)
+    return array('d', accumulate(weights))
+
+
+def pick(population, cum_weights, rng=random):
+    index = bisect.bisect(cum_weights, rng.random() * cum_weights[-1])
+    return population[min(index, len(population) - 1)]
+
+
+@contextmanager
+def manual_dates():
+    """Отключает auto_now_add, чтобы задать даты постов и комментариев."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def bulk_insert(model, objects, batch_size, ignore_conflicts=False):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == batch_size:
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    batch, ignore_conflicts=ignore_conflicts
+                )
+            batch = []
+    if batch:
+        with transaction.atomic():
+            model.objects.bulk_create(batch, ignore_conflicts=ignore_conflicts)
+
+
+def dates(count, days, rng=random):
+    """count дат за последние days дней в порядке возрастания."""
+    now = timezone.now()
+    span = timedelta(days=days).total_seconds()
+    step = span / count
+    for i in range(count):
+        offset = span - step * i - rng.random() * step
+        yield now - timedelta(seconds=offset)
+
+
+def ids(model):
+    return array('q', model.objects.order_by('pk').values_list(
+        'pk', flat=True
+    ).iterator())
+
+
+def seed_users(count, batch_size, mixer):
+    password = make_password(None)
+    bulk_insert(
+        User,
+        (
+            mixer.blend(
+                User,
+                username=f'{mixer.faker.user_name()}{i}',
+                password=password,
+            )
+            for i in range(count)
+        ),
+        batch_size,
+    )
+    return ids(User)
+
+
+def seed_groups(count, batch_size, mixer):
+    bulk_insert(
+        Group,
+        (
+            mixer.blend(Group, slug=f'{mixer.faker.slug()}-{i}')
+            for i in range(count)
+        ),
+        batch_size,
+    )
+    return ids(Group)
+
+
+def seed_posts(count, user_ids, group_ids, texts, days, batch_size, rng):
+    authors = zipf_weights(len(user_ids), rng=rng)
+    bulk_insert(
+        Post,
+        (
+            Post(
+                author_id=pick(user_ids, authors, rng),
+                # Примерно половина постов публикуется в группах.
+                group_id=(
+                    rng.choice(group_ids) if rng.random() < 0.5 else None
+                ),
+                text=rng.choice(texts),
+                pub_date=pub_date,
+            )
+            for pub_date in dates(count, days, rng)
+        ),
+        batch_size,
+    )
+    return ids(Post)
+
+
+def seed_comments(count, user_ids, post_ids, texts, days, batch_size, rng):
+    # Обсуждаемость постов тоже подчиняется степенному закону.
+    posts = zipf_weights(len(post_ids), rng=rng)
+    bulk_insert(
+        Comment,
+        (
+            Comment(
+                post_id=pick(post_ids, posts, rng),
+                author_id=rng.choice(user_ids),
+                text=rng.choice(texts),
+                created=created,
+            )
+            for created in dates(count, days, rng)
+        ),
+        batch_size,
+    )
+
+
+def seed_follows(user_ids, per_user, batch_size, rng):
+    """Граф подписок: популярность авторов и число подписок по Парето."""
+    authors = zipf_weights(len(user_ids), rng=rng)
+    limit = len(user_ids) - 1
+    # Среднее распределения Парето равно alpha / (alpha - 1).
+    mean = PARETO_ALPHA / (PARETO_ALPHA - 1)
+
+    def follows():
+        for user_id in user_ids:
+            wanted = int(rng.paretovariate(PARETO_ALPHA) * per_user / mean)
+            chosen = {
+                pick(user_ids, authors, rng)
+                for _ in range(min(wanted, limit))
+            }
+            chosen.discard(user_id)
+            for author_id in chosen:
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    bulk_insert(Follow, follows(), batch_size, ignore_conflicts=True)
+
+
+def fill_counters(batch_size):
+    """Денормализованные счётчики одним проходом вместо сигналов."""
+    comments = Comment.objects.filter(post=OuterRef('pk')).order_by()
+    comments = comments.values('post').annotate(count=Count('pk'))
+    Post.objects.update(comments_count=Coalesce(
+        Subquery(comments.values('count')), Value(0)
+    ))
+    UserCounters.objects.all().delete()
+    bulk_insert(
+        UserCounters,
+        (
+            UserCounters(user_id=user_id, **expected)
+            for user_id, expected in user_counters_drift()
+        ),
+        batch_size,
+    )
+
+
+def build_timelines(user_ids):
+    """Ленты подписок для пользователей, от имени которых идут замеры."""
+    follows = Follow.objects.filter(user_id__in=user_ids).values_list(
+        'user_id', 'author_id'
+    )
+    timeline.backfill_many(follows)
+
+
+def seed(scale=1.0, days=365, batch_size=5000, timeline_users=100,
+         random_seed=0, log=print):
+    """Заполняет базу, возвращает число созданных объектов по моделям."""
+    rng = random.Random(random_seed)
+    mixer = Mixer(commit=False)
+    mixer.faker.seed_instance(random_seed)
+    texts = [mixer.faker.paragraph() for _ in range(TEXTS_POOL)]
+    comment_texts = [mixer.faker.sentence() for _ in range(TEXTS_POOL)]
+
+    log('Пользователи')
+    user_ids = seed_users(scaled(USERS, scale), batch_size, mixer)
+    log('Группы')
+    group_ids = seed_groups(scaled(GROUPS, scale), batch_size, mixer)
+    with manual_dates():
+        log('Посты')
+        post_ids = seed_posts(scaled(POSTS, scale), user_ids, group_ids,
+                              texts, days, batch_size, rng)
+        log('Комментарии')
+        seed_comments(scaled(COMMENTS, scale), user_ids, post_ids,
+                      comment_texts, days, batch_size, rng)
+    log('Подписки')
+    seed_follows(user_ids, FOLLOWS_PER_USER, batch_size, rng)
+    log('Счётчики')
+    fill_counters(batch_size)
+    log('Ленты подписок')
+    build_timelines(user_ids[:timeline_users])
+    if search.fts_available():
+        log('Поисковый индекс')
+        search.rebuild()
+    return {
+        model.__name__: model.objects.count()
+        for model in (User, Group, Post, Comment, Follow)
+    }
@@ -0,0 +1,88 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+
+from posts.models import Comment, Follow, Post, TimelineEntry, User
+
+from ..runner import routes
+
+
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('seed_benchmark', scale=0.0002, stdout=StringIO())
+
+    def test_seed(self):
+        '''Объёмы пропорциональны scale, счётчики и ленты заполнены.'''
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Post.objects.count(), 1000)
+        self.assertEqual(Comment.objects.count(), 4000)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        out = StringIO()
+        call_command('recount_counters', dry_run=True, stdout=out)
+        self.assertIn('Расхождений найдено: 0', out.getvalue())
+
+    def test_run_writes_json(self):
+        '''Прогон пишет метрики всех маршрутов posts и users в JSON.'''
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'benchmark.json')
+            call_command(
+                'run_benchmark', output=output, iterations=2, warmup=0,
+                compare=None, stdout=StringIO(),
+            )
+            with open(output, encoding='utf-8') as file:
+                results = json.load(file)
+        self.assertEqual(results['meta']['rows']['Post'], 1000)
+        for name, _ in routes():
+            with self.subTest(name=name):
+                self.assertIn(f'GET {name}', results['routes'])
+        index = results['routes']['GET posts:index']
+        self.assertEqual(index['status'], 200)
+        self.assertGreater(index['queries'], 0)
+        self.assertGreater(index['rows_read'], 0)
+        self.assertIn('POST posts:post_create', results['routes'])
+        self.assertEqual(Post.objects.count(), 1000)
+
+
+class ContentionBenchmarkTest(TransactionTestCase):
+    def test_run_writes_json(self):
+        '''Замер нагрузки сравнивает профили прагм и пишет JSON.'''
+        user = User.objects.create_user(username='test_contention_user')
+        Post.objects.create(author=user, text='Text_contention')
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'contention.json')
+            call_command(
+                'run_contention_benchmark', output=output, writers=1,
+                readers=1, duration=0.2, stdout=StringIO(),
+            )
+            with open(output, encoding='utf-8') as file:
+                results = json.load(file)
+        self.assertEqual(set(results['profiles']), {'baseline', 'tuned'})
+        tuned = results['profiles']['tuned']
+        self.assertGreater(tuned['write']['per_second'], 0)
+        self.assertGreater(tuned['read']['per_second'], 0)
+        self.assertEqual(
+            results['meta']['pragmas']['tuned']['journal_mode'], 'WAL'
+        )
+        # Нагрузка шла по копиям, основная база не изменилась.
+        self.assertEqual(Post.objects.count(), 1)
+
+
+class ImageBenchmarkTest(TestCase):
+    def test_run_writes_json(self):
+        '''Замер картинок пишет JSON с размерами до и после.'''
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'images.json')
+            call_command('run_image_benchmark', output=output,
+                         synthetic=1, stdout=StringIO())
+            with open(output, encoding='utf-8') as file:
+                results = json.load(file)
+        self.assertEqual(results['total']['images'], 1)
+        self.assertLess(results['total']['bytes_after'],
+                        results['total']['bytes_before'])
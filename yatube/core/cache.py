@@ -0,0 +1,195 @@
+import hashlib
+import math
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.http import HttpResponse
+
+from .conditional import mark_stale, page_state
+
+CACHE_BYPASS_SESSION_KEY = 'cache_bypass_until'
+
+VERSION_KEY_SUFFIX = ':version'
+
+
+def _version_key(name):
+    return f'{name}{VERSION_KEY_SUFFIX}'
+
+
+def _new_version():
+    # Метка времени вместо 1: после вытеснения ключа версии
+    # старые записи не станут снова актуальными.
+    return int(time.time() * 1000)
+
+
+def get_cache_version(name):
+    """Текущее поколение кеша с именем name."""
+    version = cache.get(_version_key(name))
+    if version is None:
+        version = _new_version()
+        if not cache.add(_version_key(name), version, None):
+            version = cache.get(_version_key(name), version)
+    return version
+
+
+def get_cache_versions(names):
+    """Поколения нескольких кешей за один запрос к кешу."""
+    versions = cache.get_many([_version_key(name) for name in names])
+    return [
+        versions.get(_version_key(name)) or get_cache_version(name)
+        for name in names
+    ]
+
+
+def bump_cache_version(name):
+    """Делает все записи кеша name устаревшими."""
+    try:
+        cache.incr(_version_key(name))
+    except ValueError:
+        cache.set(_version_key(name), _new_version(), None)
+
+
+def bump_cache_version_on_commit(name):
+    """bump_cache_version сейчас и ещё раз после коммита транзакции.
+
+    Параллельный запрос между сбросом и коммитом видит новое поколение,
+    но ещё старые строки и сохранил бы их копию под новым поколением.
+    """
+    bump_cache_version(name)
+    transaction.on_commit(lambda: bump_cache_version(name))
+
+
+def is_shared_cache(alias=DEFAULT_CACHE_ALIAS):
+    """Видят ли записи в кеш alias другие процессы."""
+    backend = caches[alias]
+    if isinstance(backend, (LocMemCache, DummyCache)):
+        return False
+    # У TwoTierCache общий только второй уровень.
+    shared = getattr(backend, '_shared_alias', None)
+    return shared is None or is_shared_cache(shared)
+
+
+def allow_read_your_writes(request):
+    """Автор некоторое время видит страницы в обход кеша и реплики."""
+    request.session[CACHE_BYPASS_SESSION_KEY] = (
+        time.time() + settings.CACHE_BYPASS_SECONDS
+    )
+
+
+def reads_own_writes(request):
+    """Пользователь недавно писал и должен видеть свои изменения."""
+    return request.session.get(CACHE_BYPASS_SESSION_KEY, 0) > time.time()
+
+
+def page_cache_key(key_prefix, request):
+    """Ключ копии страницы: адрес с параметрами и пользователь."""
+    key = repr((request.get_full_path(), request.user.pk))
+    return f'{key_prefix}:page:{hashlib.md5(key.encode()).hexdigest()}'
+
+
+def _expired(entry):
+    # XFetch: срок сокращается на случайную величину, пропорциональную
+    # времени построения страницы, и популярная копия обновляется
+    # одним запросом чуть раньше, а не всеми сразу в момент истечения.
+    early = -entry['delta'] * settings.PAGE_CACHE_BETA * math.log(
+        1.0 - random.random()
+    )
+    return time.time() + early >= entry['expires']
+
+
+def _from_entry(entry, request=None, current=None):
+    response = HttpResponse(entry['content'], status=entry['status'])
+    for header, value in entry['headers']:
+        response[header] = value
+    if request is not None and entry['state'] != current:
+        mark_stale(response, request, entry['state'])
+    return response
+
+
+def _wait_for(key, state):
+    deadline = time.monotonic() + settings.PAGE_CACHE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None and entry['state'] == state:
+            return entry
+    return None
+
+
+def _acquire(lock):
+    """Берёт блокировку перестроения; вернёт токен владельца или None.
+
+    Блокировка — cache.add, поэтому add должен быть атомарным во всём
+    кеше: у LocMemCache это так, у общего уровня TwoTierCache —
+    благодаря LockingFileBasedCache.
+    """
+    token = random.getrandbits(64)
+    if cache.add(lock, token, settings.PAGE_CACHE_LOCK_TIMEOUT):
+        return token
+    return None
+
+
+def _release(lock, token):
+    # Блокировка могла истечь и достаться другому запросу.
+    if cache.get(lock) == token:
+        cache.delete(lock)
+
+
+def swr_cache_page(timeout, key_prefix, state):
+    """Кеш страниц, который отдаёт устаревшую копию, пока её обновляет
+    один запрос.
+
+    Копия устаревает по timeout или когда меняется состояние страницы
+    state(request, **kwargs), то же, что у conditional_page. Первый
+    запрос к устаревшей копии берёт блокировку и строит страницу заново,
+    остальные в это время получают старую копию. Если копии нет совсем,
+    они недолго ждут новую. Ключ включает адрес и пользователя.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                request.method not in ('GET', 'HEAD')
+                or reads_own_writes(request)
+            ):
+                return view(request, *args, **kwargs)
+            key = page_cache_key(key_prefix, request)
+            current = page_state(request, state, **kwargs)
+            entry = cache.get(key)
+            if (
+                entry is not None
+                and entry['state'] == current
+                and not _expired(entry)
+            ):
+                return _from_entry(entry)
+            lock = f'{key}:lock'
+            token = _acquire(lock)
+            if token is None:
+                if entry is None:
+                    entry = _wait_for(key, current)
+                if entry is not None:
+                    return _from_entry(entry, request, current)
+                return view(request, *args, **kwargs)
+            try:
+                start = time.monotonic()
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    cache.set(key, {
+                        'content': response.content,
+                        'status': response.status_code,
+                        'headers': list(response.items()),
+                        'state': current,
+                        'expires': time.time() + timeout,
+                        'delta': time.monotonic() - start,
+                    }, timeout + settings.PAGE_CACHE_STALE_TIMEOUT)
+                return response
+            finally:
+                _release(lock, token)
+        return wrapper
+    return decorator
@@ -0,0 +1,199 @@
+"""Двухуровневый кеш: маленький LRU в памяти процесса (L1) перед общим
+для всех процессов кешем (L2).
+
+L1 хранит записи не дольше L1_TIMEOUT секунд, поэтому значение,
+изменённое другим процессом, видно здесь с задержкой не больше этой.
+Ключи поколений (core.cache) в L1 не кладутся и всегда читаются из L2:
+после bump_cache_version каждый процесс сразу строит новые ключи, а
+записи старого поколения в L1 просто перестают запрашиваться.
+
+add и incr выполняются в L2 и атомарны между процессами, только если
+они атомарны в самом L2. У FileBasedCache Django это чтение и запись
+порознь, поэтому вторым уровнем служит LockingFileBasedCache.
+"""
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from time import monotonic
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files import locks
+
+from .cache import VERSION_KEY_SUFFIX
+
+_MISSING = object()
+
+# L1 одного процесса, общий для потоков, как у LocMemCache
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class _LRU:
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._l1_timeout = options.get('L1_TIMEOUT', 5)
+        self._l1_max_entries = options.get('L1_MAX_ENTRIES', 1000)
+        with _stores_lock:
+            self._l1 = _stores.setdefault(location, _LRU())
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _l1_key(self, key, version):
+        if key.endswith(VERSION_KEY_SUFFIX):
+            return None
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        return key
+
+    def _l1_get(self, key):
+        with self._l1.lock:
+            entry = self._l1.entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires, data = entry
+            if expires <= monotonic():
+                del self._l1.entries[key]
+                return _MISSING
+            self._l1.entries.move_to_end(key)
+        return pickle.loads(data)
+
+    def _l1_set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        if key is None:
+            return
+        ttl = self._l1_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            ttl = min(ttl, timeout)
+        if ttl <= 0:
+            self._l1_delete(key)
+            return
+        # Хранится копия: изменение полученного объекта не портит L1.
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._l1.lock:
+            self._l1.entries[key] = (monotonic() + ttl, data)
+            self._l1.entries.move_to_end(key)
+            while len(self._l1.entries) > self._l1_max_entries:
+                self._l1.entries.popitem(last=False)
+
+    def _l1_delete(self, key):
+        if key is None:
+            return
+        with self._l1.lock:
+            self._l1.entries.pop(key, None)
+
+    def get(self, key, default=None, version=None):
+        l1_key = self._l1_key(key, version)
+        if l1_key is not None:
+            value = self._l1_get(l1_key)
+            if value is not _MISSING:
+                return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        self._l1_set(l1_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            l1_key = self._l1_key(key, version)
+            value = _MISSING if l1_key is None else self._l1_get(l1_key)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            shared = self.shared.get_many(missing, version=version)
+            for key, value in shared.items():
+                self._l1_set(self._l1_key(key, version), value)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._l1_set(self._l1_key(key, version), value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            l1_key = self._l1_key(key, version)
+            if key in failed:
+                self._l1_delete(l1_key)
+            else:
+                self._l1_set(l1_key, value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self._l1_key(key, version)
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._l1_set(l1_key, value, timeout)
+        else:
+            # В L2 уже другое значение, следующее чтение возьмёт его.
+            self._l1_delete(l1_key)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._l1_delete(self._l1_key(key, version))
+        self.shared.delete(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._l1_delete(self._l1_key(key, version))
+        return self.shared.incr(key, delta, version=version)
+
+    def has_key(self, key, version=None):
+        l1_key = self._l1_key(key, version)
+        if l1_key is not None and self._l1_get(l1_key) is not _MISSING:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def clear(self):
+        with self._l1.lock:
+            self._l1.entries.clear()
+        self.shared.clear()
+
+
+class LockingFileBasedCache(FileBasedCache):
+    """FileBasedCache с атомарными add и incr.
+
+    Обе операции выполняются под исключительной блокировкой файла
+    каталога кеша (flock), общей для всех процессов на этой машине.
+    Остальные операции атомарны и так: set пишет временный файл и
+    переименовывает его.
+    """
+    lock_name = 'atomic.lock'
+
+    @contextmanager
+    def _locked(self):
+        self._createdir()
+        with open(os.path.join(self._dir, self.lock_name), 'ab') as file:
+            locks.lock(file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(file)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked():
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        with self._locked():
+            return super().incr(key, delta, version)
@@ -0,0 +1,65 @@
+import hashlib
+from calendar import timegm
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+
+
+def page_state(request, state, **kwargs):
+    """state(request, **kwargs), посчитанный один раз за запрос."""
+    if not hasattr(request, 'page_state'):
+        request.page_state = state(request, **kwargs)
+    return request.page_state
+
+
+def page_etag(request, state):
+    """ETag страницы с состоянием state для пользователя запроса."""
+    key = repr((
+        state,
+        request.user.pk,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+        request.GET.urlencode(),
+    ))
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def mark_stale(response, request, state):
+    """Валидаторы копии страницы, построенной при состоянии state.
+
+    condition() не перезаписывает уже выставленные ETag и
+    Last-Modified, поэтому устаревшая копия не получит текущие и браузер
+    не будет подтверждать её ответом 304. no-cache заставляет его
+    перепроверить страницу при следующем показе.
+    """
+    response['ETag'] = quote_etag(page_etag(request, state))
+    if state[0] is not None:
+        response['Last-Modified'] = http_date(
+            timegm(state[0].utctimetuple())
+        )
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def conditional_page(state, last_modified=True):
+    """condition() с валидаторами из state(request, **kwargs).
+
+    state — дешёвый запрос метаданных страницы, кортеж, первым
+    элементом которого идёт дата последнего изменения или None.
+    Он выполняется один раз до представления. В ETag также входят
+    пользователь, CSRF-cookie (страница содержит токен) и параметры
+    запроса.
+    """
+    def get_state(request, **kwargs):
+        return page_state(request, state, **kwargs)
+
+    def etag(request, **kwargs):
+        return page_etag(request, get_state(request, **kwargs))
+
+    def modified(request, **kwargs):
+        return get_state(request, **kwargs)[0]
+
+    return condition(
+        etag_func=etag, last_modified_func=modified if last_modified else None
+    )
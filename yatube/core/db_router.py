@@ -0,0 +1,38 @@
+"""Чтение из реплики для представлений, которые только читают.
+
+ReplicaMiddleware включает реплику на время запроса к представлению
+из READ_REPLICA_VIEWS. Первая запись в запросе возвращает остальные
+чтения в основную базу, чтобы запрос видел то, что сам записал.
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+
+# База для чтения в текущем запросе; None — основная
+read_database = ContextVar('read_database', default=None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            read_database.get() == REPLICA
+            and model._meta.app_label in settings.READ_REPLICA_APPS
+        ):
+            return REPLICA
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        read_database.set(None)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # В реплике те же данные, что и в основной базе.
+        if {obj1._state.db, obj2._state.db} <= {PRIMARY, REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
@@ -0,0 +1,231 @@
+"""Очередь фоновых задач в таблице базы данных, без брокера.
+
+Функция, помеченная @job, ставится в очередь вызовом enqueue: строка
+Job появляется после коммита транзакции, поэтому задача не увидит
+незаписанных данных и не запустится после отката. Задачи выполняет
+команда runworker (Worker): в каждой очереди одновременно выполняется
+не больше JOB_QUEUES[очередь] задач. Упавшая задача повторяется через
+JOB_RETRY_DELAY, 2 × JOB_RETRY_DELAY, … секунд, пока не исчерпает
+max_attempts, после чего остаётся в таблице со статусом failed.
+
+Выполняемая задача «занята» на JOB_LEASE секунд, и пока она идёт,
+обработчик продлевает аренду: если он упал, не закончив задачу, её
+заберёт следующий, а долгую живую задачу второй раз не запустят.
+"""
+import json
+import logging
+import threading
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from time import monotonic
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+from .sqlite import immediate_transaction
+
+logger = logging.getLogger(__name__)
+
+
+class JobFunction:
+    """Функция-задача: вызов выполняет её сразу, enqueue — в фоне."""
+
+    def __init__(self, func, queue, max_attempts, unique):
+        self.func = func
+        self.queue = queue
+        self.max_attempts = max_attempts
+        self.unique = unique
+        self.name = f'{func.__module__}.{func.__qualname__}'
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, *args, **kwargs):
+        """Ставит задачу в очередь после коммита текущей транзакции.
+
+        Аргументы должны сериализоваться в JSON.
+        """
+        payload = json.dumps({'args': args, 'kwargs': kwargs})
+        transaction.on_commit(lambda: self._insert(payload))
+
+    def _insert(self, payload):
+        # Задача с теми же аргументами уже ждёт или выполняется.
+        if self.unique and Job.objects.filter(
+            name=self.name, payload=payload,
+            status__in=(Job.QUEUED, Job.RUNNING),
+        ).exists():
+            return
+        Job.objects.create(
+            queue=self.queue,
+            name=self.name,
+            payload=payload,
+            max_attempts=self.max_attempts or settings.JOB_MAX_ATTEMPTS,
+        )
+
+
+def job(queue='default', max_attempts=None, unique=False):
+    """Декоратор задачи; unique — не ставить повтор ждущей задачи."""
+    def decorator(func):
+        return JobFunction(func, queue, max_attempts, unique)
+    return decorator
+
+
+def resolve(name):
+    """Функция-задача по имени; ничего, кроме задач, не вызывается."""
+    function = import_string(name)
+    if not isinstance(function, JobFunction):
+        raise ImportError(f'{name} не помечена @job')
+    return function
+
+
+def retry_delay(attempts):
+    return min(
+        settings.JOB_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.JOB_RETRY_MAX_DELAY,
+    )
+
+
+def _available(now):
+    return Q(status=Job.QUEUED, run_at__lte=now) | Q(
+        status=Job.RUNNING, locked_until__lte=now,
+    )
+
+
+def claim(queue, limit):
+    """Забирает до limit задач queue с учётом уже выполняемых."""
+    # Подсчёт и захват в одной транзакции с блокировкой записи: иначе
+    # два обработчика вместе превысят limit.
+    with immediate_transaction():
+        now = timezone.now()
+        running = Job.objects.filter(
+            queue=queue, status=Job.RUNNING, locked_until__gt=now,
+        ).count()
+        claimed = list(Job.objects.filter(
+            _available(now), queue=queue,
+        ).values_list('pk', flat=True)[:max(limit - running, 0)])
+        Job.objects.filter(pk__in=claimed).update(
+            status=Job.RUNNING,
+            attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=settings.JOB_LEASE),
+        )
+    return claimed
+
+
+def extend(pks):
+    """Продлевает аренду выполняемых задач pks на JOB_LEASE секунд."""
+    Job.objects.filter(pk__in=pks, status=Job.RUNNING).update(
+        locked_until=timezone.now() + timedelta(seconds=settings.JOB_LEASE)
+    )
+
+
+def execute(pk):
+    """Выполняет забранную задачу pk и записывает результат."""
+    record = Job.objects.get(pk=pk)
+    try:
+        if record.attempts > record.max_attempts:
+            raise RuntimeError('Обработчик не завершил задачу')
+        arguments = json.loads(record.payload)
+        resolve(record.name)(*arguments['args'], **arguments['kwargs'])
+    except Exception:
+        logger.exception('Задача %s (%s) упала', record.name, pk)
+        error = traceback.format_exc()
+        if record.attempts < record.max_attempts:
+            Job.objects.filter(pk=pk).update(
+                status=Job.QUEUED,
+                locked_until=None,
+                run_at=timezone.now() + timedelta(
+                    seconds=retry_delay(record.attempts)
+                ),
+                last_error=error,
+            )
+        else:
+            Job.objects.filter(pk=pk).update(
+                status=Job.FAILED, locked_until=None, last_error=error,
+            )
+        return False
+    Job.objects.filter(pk=pk).delete()
+    return True
+
+
+class Worker:
+    """Пул потоков, выполняющий задачи очередей queues."""
+
+    def __init__(self, queues=None, poll_interval=None):
+        limits = settings.JOB_QUEUES
+        self.limits = {
+            queue: limits[queue] for queue in (queues or limits)
+        }
+        self.poll_interval = (
+            settings.JOB_POLL_INTERVAL if poll_interval is None
+            else poll_interval
+        )
+        self.stopping = threading.Event()
+        self.processed = 0
+
+    def stop(self):
+        """Перестать забирать задачи; начатые будут доделаны."""
+        self.stopping.set()
+
+    def _execute(self, pk):
+        try:
+            return execute(pk)
+        finally:
+            # У потока пула свои соединения с БД, их нужно закрыть.
+            connections.close_all()
+
+    def _check(self, pk, future):
+        # Ошибка вне execute (например, при записи результата) иначе
+        # потерялась бы в future; задачу заберут снова после аренды.
+        error = future.exception()
+        if error is not None:
+            logger.error('Обработчик задачи %s упал', pk, exc_info=error)
+
+    def _reap(self, running, timeout):
+        """Ждёт выполняемые задачи до timeout секунд и продлевает аренду."""
+        # Аренда продлевается каждые JOB_LEASE / 2 секунд, поэтому и
+        # ждать дольше нельзя.
+        lease = settings.JOB_LEASE
+        done, _ = wait(
+            running, timeout=min(timeout, lease / 2),
+            return_when=FIRST_COMPLETED,
+        )
+        for future in done:
+            self._check(running.pop(future), future)
+            self.processed += 1
+        if running and monotonic() >= self.renew_at:
+            extend(list(running.values()))
+            self.renew_at = monotonic() + lease / 2
+
+    def run(self, burst=False):
+        """Выполняет задачи до stop(); с burst — пока очереди не опустеют."""
+        running = {}
+        executor = ThreadPoolExecutor(
+            max_workers=sum(self.limits.values()),
+            thread_name_prefix='jobs',
+        )
+        self.renew_at = monotonic() + settings.JOB_LEASE / 2
+        try:
+            while not self.stopping.is_set():
+                claimed = 0
+                for queue, limit in self.limits.items():
+                    # Свои занятые задачи уже учтены в claim через БД.
+                    for pk in claim(queue, limit):
+                        running[executor.submit(self._execute, pk)] = pk
+                        claimed += 1
+                if not running:
+                    if burst:
+                        break
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                self._reap(running, 0 if claimed else self.poll_interval)
+            while running:
+                self._reap(running, self.poll_interval)
+        finally:
+            executor.shutdown(wait=True)
+            connections.close_all()
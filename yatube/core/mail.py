@@ -0,0 +1,39 @@
+"""Отправка писем через очередь задач (core.jobs).
+
+QueuedEmailBackend не держит запрос, пока письмо пишется или уходит:
+он ставит задачу deliver, которая отправит письмо через
+QUEUED_EMAIL_BACKEND. Вложения не поддерживаются.
+"""
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .jobs import job
+
+FIELDS = ('subject', 'body', 'from_email', 'to', 'cc', 'bcc', 'reply_to')
+
+
+@job(queue='email')
+def deliver(message):
+    """Отправляет письмо, сохранённое QueuedEmailBackend."""
+    email = EmailMultiAlternatives(
+        connection=get_connection(settings.QUEUED_EMAIL_BACKEND),
+        headers=message.get('extra_headers'),
+        alternatives=[tuple(item) for item in message['alternatives']],
+        **{field: message[field] for field in FIELDS},
+    )
+    email.send()
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            if message.attachments:
+                raise ValueError('Вложения в письмах из очереди не '
+                                 'поддерживаются')
+            deliver.enqueue({
+                **{field: getattr(message, field) for field in FIELDS},
+                'extra_headers': message.extra_headers,
+                'alternatives': getattr(message, 'alternatives', []),
+            })
+        return len(email_messages)
@@ -0,0 +1,40 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет фоновые задачи из очередей JOB_QUEUES в пуле потоков. '
+        'Останавливается по Ctrl+C или SIGTERM, доделав начатые задачи.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queue', action='append', dest='queues',
+            help='Очередь; можно указать несколько раз. По умолчанию все.',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float,
+            help='Как часто проверять очереди, в секундах.',
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Выйти, когда задач не останется.',
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options['queues'] or ()) - set(settings.JOB_QUEUES)
+        if unknown:
+            raise CommandError(f'Нет очередей: {", ".join(sorted(unknown))}')
+        worker = Worker(options['queues'], options['poll_interval'])
+        if not options['burst']:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *args: worker.stop())
+        worker.run(burst=options['burst'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Выполнено задач: {worker.processed}')
+        )
@@ -0,0 +1,139 @@
+"""Гистограммы времени ответа, SQL и отрисовки шаблонов по представлениям.
+
+Данные копятся в памяти процесса и отдаются в текстовом формате
+Prometheus. При нескольких процессах каждый отдаёт свои значения,
+суммирует их Prometheus.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+# Границы корзин: секунды для времени, штуки для числа запросов
+TIME_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+METRICS = {
+    'yatube_view_latency_seconds': (
+        'Время обработки запроса представлением.', TIME_BUCKETS,
+    ),
+    'yatube_view_db_seconds': (
+        'Время SQL-запросов за запрос.', TIME_BUCKETS,
+    ),
+    'yatube_view_sql_queries': (
+        'Число SQL-запросов за запрос.', COUNT_BUCKETS,
+    ),
+    'yatube_view_render_seconds': (
+        'Время отрисовки шаблонов за запрос.', TIME_BUCKETS,
+    ),
+}
+
+# Замеры текущего запроса; None вне запроса
+current = ContextVar('current_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'db_time', 'render_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        """Обёртка для connection.execute_wrapper."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+
+
+_histograms = {}
+_lock = threading.Lock()
+
+
+def observe(view, latency, request_metrics):
+    values = {
+        'yatube_view_latency_seconds': latency,
+        'yatube_view_db_seconds': request_metrics.db_time,
+        'yatube_view_sql_queries': request_metrics.queries,
+        'yatube_view_render_seconds': request_metrics.render_time,
+    }
+    with _lock:
+        for name, value in values.items():
+            key = (name, view)
+            histogram = _histograms.get(key)
+            if histogram is None:
+                histogram = _histograms[key] = Histogram(METRICS[name][1])
+            histogram.observe(value)
+
+
+def add_render_time(seconds):
+    request_metrics = current.get()
+    if request_metrics is not None:
+        request_metrics.render_time += seconds
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def render_prometheus():
+    """Все гистограммы в текстовом формате Prometheus 0.0.4."""
+    with _lock:
+        snapshot = {
+            key: (list(histogram.cumulative()), histogram.sum,
+                  histogram.count)
+            for key, histogram in _histograms.items()
+        }
+    lines = []
+    for name, (help_text, _) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for (metric, view), (buckets, total, count) in sorted(
+            snapshot.items()
+        ):
+            if metric != name:
+                continue
+            view = _label(view)
+            for bound, cumulative in buckets:
+                lines.append(
+                    f'{name}_bucket{{view="{view}",le="{bound}"}} '
+                    f'{cumulative}'
+                )
+            lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {count}')
+            lines.append(f'{name}_sum{{view="{view}"}} {total}')
+            lines.append(f'{name}_count{{view="{view}"}} {count}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,180 @@
+import mimetypes
+import os
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connections
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from . import db_router, metrics
+from .cache import reads_own_writes
+
+UNRESOLVED_VIEW = '<unresolved>'
+
+
+class MetricsMiddleware:
+    """Пишет в гистограммы core.metrics замеры каждого запроса."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(
+                        request_metrics.sql_wrapper
+                    ))
+                response = self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        match = getattr(request, 'resolver_match', None)
+        metrics.observe(
+            match.view_name if match else UNRESOLVED_VIEW,
+            time.perf_counter() - start,
+            request_metrics,
+        )
+        return response
+
+
+class ReplicaMiddleware:
+    """Переключает чтения представлений READ_REPLICA_VIEWS на реплику.
+
+    Пользователь, который недавно писал (allow_read_your_writes), читает
+    из основной базы, пока реплика его не догонит.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = db_router.read_database.set(None)
+        try:
+            return self.get_response(request)
+        finally:
+            db_router.read_database.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            settings.READ_REPLICA_ENABLED
+            and request.method in ('GET', 'HEAD')
+            and request.resolver_match.view_name
+            in settings.READ_REPLICA_VIEWS
+            and not reads_own_writes(request)
+        ):
+            # Пользователь запроса загружается из основной базы до
+            # переключения: только что созданного реплика может не знать.
+            request.user.pk
+            db_router.read_database.set(db_router.REPLICA)
+
+
+def accepted_encodings(request):
+    """Кодировки из Accept-Encoding, кроме отключённых через q=0."""
+    encodings = set()
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, *params = item.split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name.strip() and quality > 0:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+class StaticFilesMiddleware:
+    """Отдаёт файлы из STATIC_ROOT без отдельного веб-сервера.
+
+    Из копий, записанных collectstatic (core.storage), выбирается лучшая,
+    которую принимает клиент: brotli, gzip или несжатый файл. Файлы с
+    хешем в имени кешируются навсегда (immutable), остальные —
+    на STATIC_MAX_AGE секунд.
+    """
+
+    # Порядок предпочтения: (кодировка, расширение копии)
+    ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.root = settings.STATIC_ROOT
+        self.prefix = settings.STATIC_URL
+        hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+        self.hashed_names = set(hashed_files.values())
+
+    def __call__(self, request):
+        if (
+            self.root
+            and request.method in ('GET', 'HEAD')
+            and request.path_info.startswith(self.prefix)
+        ):
+            response = self.serve(request, request.path_info[
+                len(self.prefix):
+            ])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def find(self, name):
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        return path if os.path.isfile(path) else None
+
+    def serve(self, request, name):
+        path = self.find(name)
+        if path is None:
+            return None
+        stat = os.stat(path)
+        if not was_modified_since(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'),
+            stat.st_mtime, stat.st_size,
+        ):
+            response = HttpResponseNotModified()
+        else:
+            response = self.file_response(request, name, path)
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Cache-Control'] = (
+            'public, max-age=31536000, immutable'
+            if name in self.hashed_names
+            else f'public, max-age={settings.STATIC_MAX_AGE}'
+        )
+        return response
+
+    def file_response(self, request, name, path):
+        content_type, encoding = mimetypes.guess_type(name)
+        if encoding:
+            # Файл, сжатый целиком (.gz в исходниках), отдаётся как есть.
+            content_type = 'application/octet-stream'
+        accepted = accepted_encodings(request)
+        has_variants = False
+        served_path, served_encoding = path, None
+        for encoding, suffix in self.ENCODINGS:
+            if not os.path.isfile(path + suffix):
+                continue
+            has_variants = True
+            if encoding in accepted and served_encoding is None:
+                served_path, served_encoding = path + suffix, encoding
+        response = FileResponse(
+            open(served_path, 'rb'),
+            content_type=content_type or 'application/octet-stream',
+        )
+        if served_encoding:
+            response['Content-Encoding'] = served_encoding
+        if has_variants:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        return response
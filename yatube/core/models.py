@@ -0,0 +1,41 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди, см. core.jobs."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    queue = models.CharField('Очередь', max_length=50)
+    name = models.CharField('Задача', max_length=200)
+    # Аргументы в JSON: {"args": [...], "kwargs": {...}}
+    payload = models.TextField('Аргументы')
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=QUEUED,
+    )
+    attempts = models.PositiveIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveIntegerField('Максимум попыток')
+    run_at = models.DateTimeField('Не раньше', default=timezone.now)
+    locked_until = models.DateTimeField(
+        'Занята до', null=True, blank=True,
+        help_text='Если обработчик упал, задачу заберёт другой',
+    )
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+
+    class Meta:
+        ordering = ['run_at']
+        indexes = [
+            models.Index(fields=['queue', 'status', 'run_at'],
+                         name='job_queue_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} [{self.queue}]'
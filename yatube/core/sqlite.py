@@ -0,0 +1,44 @@
+"""Настройка каждого нового соединения с SQLite.
+
+В режиме WAL читатели не ждут писателя, а synchronous=NORMAL в этом
+режиме не нарушает целостность базы при падении процесса. busy_timeout
+заставляет ждать освободившуюся блокировку, а не сразу падать с
+«database is locked».
+"""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """Приёмник connection_created: выполняет SQLITE_PRAGMAS."""
+    if connection.vendor != 'sqlite':
+        return
+    # Сырое соединение: прагмы не попадают в замеры и журнал запросов.
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+@contextmanager
+def immediate_transaction(using=DEFAULT_DB_ALIAS):
+    """Транзакция, которая на SQLite сразу берёт блокировку записи.
+
+    После обычного BEGIN блокировка берётся только при первой записи, и
+    два процесса успевают прочитать одно и то же. BEGIN IMMEDIATE
+    выстраивает их в очередь с самого начала. Внутри нельзя вызывать
+    transaction.atomic. Уже открытая транзакция, другие СУБД — atomic.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            cursor.execute('ROLLBACK')
+            raise
+        cursor.execute('COMMIT')
@@ -0,0 +1,108 @@
+"""Хранилища файлов.
+
+ContentAddressedStorage — картинки постов с адресацией по содержимому.
+Файл называется по SHA-256 своих байтов: posts/ab/abcdef….webp.
+Повторная загрузка тех же байтов не создаёт копию, а возвращает имя уже
+сохранённого файла, поэтому и миниатюры sorl для него не создаются
+заново. Сколько записей ссылается на файл, считает приложение
+(posts.media); файл удаляет только сборка мусора.
+
+CompressedManifestStaticFilesStorage — статика для collectstatic: имена
+с хешем содержимого и рядом с каждым файлом сжатые копии .gz и .br,
+которые отдаёт core.middleware.StaticFilesMiddleware.
+"""
+import gzip
+import hashlib
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Уже сжатые форматы: повторное сжатие почти ничего не даёт
+COMPRESSED_EXTENSIONS = frozenset((
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.woff', '.woff2',
+    '.gz', '.br', '.zip',
+))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            # Свежая дата изменения не даст сборке мусора удалить файл,
+            # на который вот-вот сошлётся новая запись.
+            os.utime(self.path(name))
+            return name
+        # При одновременной загрузке тех же байтов _save может выбрать
+        # имя с суффиксом: лишняя копия, но не ошибка.
+        return self._save(name, content)
+
+
+def compressors():
+    """Пары (расширение, функция сжатия); brotli — если установлен."""
+    yield '.gz', lambda data: gzip.compress(data, 9, mtime=0)
+    if brotli is not None:
+        yield '.br', lambda data: brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def stored_name(self, name):
+        # До первого collectstatic манифеста нет: отдаётся имя без хеша,
+        # как при DEBUG, а не ошибка при отрисовке шаблона.
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            for compressed in self.compress(name):
+                yield name, compressed, True
+
+    def compress(self, name):
+        """Пишет сжатые копии name, если они меньше исходника."""
+        extension = os.path.splitext(name)[1].lower()
+        if extension in COMPRESSED_EXTENSIONS or not self.exists(name):
+            return
+        with self.open(name) as file:
+            data = file.read()
+        if len(data) < settings.STATIC_COMPRESS_MIN_SIZE:
+            return
+        for suffix, compress in compressors():
+            compressed = compress(data)
+            if len(compressed) >= len(data):
+                continue
+            target = name + suffix
+            if self.exists(target):
+                self.delete(target)
+            self._save(target, ContentFile(compressed))
+            yield target
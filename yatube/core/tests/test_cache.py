@@ -0,0 +1,74 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache, caches
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.cache import _acquire, _release, swr_cache_page
+
+LOCATION = tempfile.mkdtemp()
+RENDERS = os.path.join(LOCATION, 'renders')
+
+
+def state(request):
+    return (1,)
+
+
+@swr_cache_page(60, 'swr_test', state)
+def slow_view(request):
+    with open(RENDERS, 'a') as file:
+        file.write('render\n')
+    time.sleep(0.3)
+    return HttpResponse('page')
+
+
+def get_page(_):
+    request = RequestFactory().get('/swr/')
+    request.user = AnonymousUser()
+    request.session = {}
+    return slow_view(request).content
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'core.cache_backends.TwoTierCache',
+        'LOCATION': 'swr-test',
+        'OPTIONS': {'SHARED': 'shared'},
+    },
+    'shared': {
+        'BACKEND': 'core.cache_backends.LockingFileBasedCache',
+        'LOCATION': os.path.join(LOCATION, 'cache'),
+    },
+})
+class SwrLockTest(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(LOCATION, ignore_errors=True)
+
+    def test_one_process_regenerates(self):
+        '''Страницу без копии строит один процесс, остальные ждут её.'''
+        caches['default'].clear()
+        with multiprocessing.get_context('fork').Pool(6) as pool:
+            pages = pool.map(get_page, range(6))
+        self.assertEqual(pages, [b'page'] * 6)
+        with open(RENDERS) as file:
+            self.assertEqual(len(file.readlines()), 1)
+
+
+class PageLockTest(SimpleTestCase):
+    def test_release_keeps_foreign_lock(self):
+        '''Истёкшую и перехваченную блокировку прежний владелец не снимает.'''
+        token = _acquire('page:lock')
+        self.assertIsNotNone(token)
+        self.assertIsNone(_acquire('page:lock'))
+        cache.set('page:lock', token + 1)
+        _release('page:lock', token)
+        self.assertEqual(cache.get('page:lock'), token + 1)
+        _release('page:lock', token + 1)
+        self.assertIsNone(cache.get('page:lock'))
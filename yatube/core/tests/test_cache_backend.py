@@ -0,0 +1,129 @@
+import multiprocessing
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from core.cache_backends import LockingFileBasedCache, TwoTierCache
+
+SHARED = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'two-tier-shared',
+}
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': SHARED,
+})
+class TwoTierCacheTest(SimpleTestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        # Два «процесса»: у каждого свой L1, L2 общий.
+        self.first = self.worker('two-tier-first')
+        self.second = self.worker('two-tier-second')
+        self.now = 1000.0
+        patcher = mock.patch(
+            'core.cache_backends.monotonic', lambda: self.now
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def worker(self, location, **options):
+        cache = TwoTierCache(location, {
+            'OPTIONS': {'SHARED': 'shared', 'L1_TIMEOUT': 5, **options},
+        })
+        cache.clear()
+        return cache
+
+    def test_value_shared_between_processes(self):
+        '''Записанное одним процессом читает другой.'''
+        self.first.set('key', 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+        self.assertEqual(self.second.get_many(['key', 'missing']),
+                         {'key': 'value'})
+
+    def test_l1_serves_until_timeout(self):
+        '''Процесс видит чужую запись не позже чем через L1_TIMEOUT.'''
+        self.first.set('key', 'old')
+        self.assertEqual(self.second.get('key'), 'old')
+        self.first.set('key', 'new')
+        self.assertEqual(self.second.get('key'), 'old')
+        self.now += 5
+        self.assertEqual(self.second.get('key'), 'new')
+
+    def test_version_keys_bypass_l1(self):
+        '''Новое поколение кеша видно всем процессам сразу.'''
+        self.first.set('index_page:version', 1)
+        self.assertEqual(self.second.get('index_page:version'), 1)
+        self.first.incr('index_page:version')
+        self.assertEqual(self.second.get('index_page:version'), 2)
+        self.assertEqual(
+            self.second.get_many(['index_page:version']),
+            {'index_page:version': 2},
+        )
+
+    def test_lru_eviction(self):
+        '''L1 хранит не больше L1_MAX_ENTRIES последних записей.'''
+        cache = self.worker('two-tier-small', L1_MAX_ENTRIES=2)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, 'old')
+        cache.get('b')
+        caches['shared'].set_many({'a': 'new', 'b': 'new', 'c': 'new'})
+        self.assertEqual(cache.get('a'), 'new')
+        self.assertEqual(cache.get('b'), 'old')
+
+    def test_delete_reaches_own_l1(self):
+        '''Удаление и add сбрасывают L1 своего процесса.'''
+        self.first.set('key', 'value')
+        self.first.delete('key')
+        self.assertIsNone(self.first.get('key'))
+        caches['shared'].set('key', 'shared')
+        self.assertFalse(self.first.add('key', 'local'))
+        self.assertEqual(self.first.get('key'), 'shared')
+
+    def test_returned_value_is_copy(self):
+        '''Изменение полученного объекта не меняет L1.'''
+        self.first.set('key', {'items': [1]})
+        self.first.get('key')['items'].append(2)
+        self.assertEqual(self.first.get('key'), {'items': [1]})
+
+
+def increment(location, times):
+    cache = LockingFileBasedCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+def try_add(location):
+    return LockingFileBasedCache(location, {}).add('lock', 1, 60)
+
+
+class LockingFileBasedCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        self.cache = LockingFileBasedCache(self.location, {})
+        self.pool = multiprocessing.get_context('fork').Pool(4)
+        self.addCleanup(self.pool.terminate)
+
+    def test_incr_atomic_between_processes(self):
+        '''Одновременные incr нескольких процессов не теряются.'''
+        self.cache.set('counter', 0)
+        self.pool.starmap(increment, [(self.location, 50)] * 4)
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_add_succeeds_once(self):
+        '''Из одновременных add ключ получает ровно один процесс.'''
+        results = self.pool.map(try_add, [self.location] * 8)
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(self.cache.get('lock'), 1)
+
+    def test_clear_keeps_lock_file(self):
+        '''Файл блокировки не считается записью кеша.'''
+        self.cache.add('key', 'value')
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'value'))
@@ -0,0 +1,204 @@
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+calls = []
+
+
+@jobs.job()
+def record(value):
+    calls.append(value)
+
+
+@jobs.job(unique=True)
+def record_once(value):
+    calls.append(value)
+
+
+@jobs.job()
+def linger(value):
+    calls.append(value)
+    time.sleep(1.5)
+
+
+@jobs.job(max_attempts=2)
+def explode():
+    raise ValueError('boom')
+
+
+@override_settings(
+    JOB_QUEUES={'default': 2, 'thumbnails': 1, 'email': 1},
+    JOB_RETRY_DELAY=10,
+)
+class JobQueueTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def run_worker(self):
+        out = StringIO()
+        call_command('runworker', burst=True, stdout=out)
+        return out.getvalue()
+
+    def test_enqueued_on_commit(self):
+        '''Задача появляется после коммита и не появляется после отката.'''
+        with transaction.atomic():
+            record.enqueue('committed')
+            self.assertFalse(Job.objects.exists())
+        self.assertEqual(Job.objects.get().name, record.name)
+        try:
+            with transaction.atomic():
+                record.enqueue('rolled back')
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_worker_runs_and_removes_jobs(self):
+        '''runworker выполняет задачи и удаляет выполненные.'''
+        for value in range(3):
+            record.enqueue(value)
+        self.assertIn('Выполнено задач: 3', self.run_worker())
+        self.assertEqual(sorted(calls), [0, 1, 2])
+        self.assertFalse(Job.objects.exists())
+
+    def test_unique_job_queued_once(self):
+        '''Повтор ждущей задачи с unique=True не ставится.'''
+        record_once.enqueue('a')
+        record_once.enqueue('a')
+        record_once.enqueue('b')
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_retry_with_backoff_then_fail(self):
+        '''Упавшая задача повторяется с паузой, потом остаётся failed.'''
+        explode.enqueue()
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.run_worker()
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('ValueError: boom', job.last_error)
+        delay = (job.run_at - timezone.now()).total_seconds()
+        self.assertTrue(5 < delay <= 10, delay)
+        self.assertEqual(jobs.retry_delay(2), 20)
+        # Пауза ещё не прошла: обработчик задачу не берёт.
+        self.run_worker()
+        self.assertEqual(Job.objects.get().attempts, 1)
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.run_worker()
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_queue_concurrency_limit(self):
+        '''Очередь отдаёт не больше JOB_QUEUES задач одновременно.'''
+        for _ in range(3):
+            Job.objects.create(queue='thumbnails', name=record.name,
+                               payload='{"args": [1], "kwargs": {}}',
+                               max_attempts=1)
+        self.assertEqual(len(jobs.claim('thumbnails', 1)), 1)
+        self.assertEqual(jobs.claim('thumbnails', 1), [])
+        self.assertEqual(len(jobs.claim('default', 2)), 0)
+        # Обработчик упал: когда аренда истекает, задачу забирают снова.
+        Job.objects.filter(status=Job.RUNNING).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(len(jobs.claim('thumbnails', 1)), 1)
+
+    def test_claim_counts_and_claims_in_one_transaction(self):
+        '''Подсчёт выполняемых и захват идут под одной блокировкой.'''
+        Job.objects.create(queue='thumbnails', name=record.name,
+                           payload='{"args": [1], "kwargs": {}}',
+                           max_attempts=1)
+        with CaptureQueriesContext(connection) as queries:
+            jobs.claim('thumbnails', 1)
+        statements = [query['sql'] for query in queries]
+        self.assertEqual(statements[0], 'BEGIN IMMEDIATE')
+        self.assertEqual(statements[-1], 'COMMIT')
+        self.assertEqual(len(statements), 5)
+
+    @override_settings(JOB_LEASE=1)
+    def test_lease_extended_while_running(self):
+        '''Задачу дольше аренды обработчик продлевает, а не берёт снова.'''
+        linger.enqueue('once')
+        jobs.Worker(poll_interval=0.1).run(burst=True)
+        self.assertEqual(calls, ['once'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_only_marked_functions_run(self):
+        '''По имени из таблицы вызывается только функция с @job.'''
+        Job.objects.create(queue='default', name='shutil.rmtree',
+                           payload='{"args": ["/"], "kwargs": {}}',
+                           max_attempts=1)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.run_worker()
+        self.assertIn('не помечена @job', Job.objects.get().last_error)
+
+    def test_worker_logs_lost_errors(self):
+        '''Ошибка вне execute не теряется, а попадает в журнал.'''
+        explode.enqueue()
+        with mock.patch.object(jobs, 'execute',
+                               side_effect=RuntimeError('lost')):
+            with self.assertLogs('core.jobs', 'ERROR') as logs:
+                self.run_worker()
+        self.assertIn('RuntimeError: lost', logs.output[0])
+
+    @override_settings(
+        EMAIL_BACKEND='core.mail.QueuedEmailBackend',
+        QUEUED_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    )
+    def test_password_reset_email_sent_by_worker(self):
+        '''Письмо сброса пароля отправляется из очереди, не в запросе.'''
+        User.objects.create_user(
+            username='test_jobs_user', email='jobs@example.com',
+            password='test_jobs_password',
+        )
+        response = self.client.post(
+            reverse('users:password_reset'), {'email': 'jobs@example.com'}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(Job.objects.get().queue, 'email')
+        self.run_worker()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['jobs@example.com'])
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_BACKGROUND=True)
+    def test_thumbnails_generated_by_worker(self):
+        '''Миниатюры создаются обработчиком очереди thumbnails.'''
+        self.addCleanup(shutil.rmtree, TEMP_MEDIA_ROOT, ignore_errors=True)
+        post = Post.objects.create(
+            author=User.objects.create_user(username='test_jobs_author'),
+            text='Text_jobs',
+            image=SimpleUploadedFile('small.gif', (
+                b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00\x00'
+                b'\x21\xF9\x04\x01\x00\x00\x00\x00\x2C\x00\x00\x00\x00'
+                b'\x01\x00\x01\x00\x00\x02\x01\x00\x00\x3B'
+            )),
+        )
+        job = Job.objects.get()
+        self.assertEqual((job.queue, job.name),
+                         ('thumbnails', 'posts.thumbnails.generate'))
+        self.run_worker()
+        post.refresh_from_db()
+        self.assertTrue(post.image_renditions)
+        self.assertFalse(Job.objects.exists())
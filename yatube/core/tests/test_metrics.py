@@ -0,0 +1,76 @@
+import re
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core import metrics
+from posts.models import Post, User
+
+
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_metrics_user')
+        cls.staff = User.objects.create_user(
+            username='test_metrics_staff', is_staff=True,
+        )
+        Post.objects.create(author=cls.user, text='Text_metrics')
+        cls.reverse_metrics = reverse('metrics')
+
+    def setUp(self):
+        metrics.reset()
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def sample(self, text, name, view):
+        match = re.search(
+            rf'^{name}{{view="{view}"}} (\S+)$', text, re.MULTILINE
+        )
+        self.assertIsNotNone(match, f'{name} {view}')
+        return float(match.group(1))
+
+    def test_metrics_only_for_staff(self):
+        '''Метрики видны только персоналу.'''
+        user_client = Client()
+        user_client.force_login(self.user)
+        for client in (Client(), user_client):
+            with self.subTest(client=client):
+                response = client.get(self.reverse_metrics)
+                self.assertRedirects(
+                    response,
+                    f'{reverse("admin:login")}?next={self.reverse_metrics}',
+                )
+        response = self.staff_client.get(self.reverse_metrics)
+        self.assertEqual(response['Content-Type'].split(';')[0], 'text/plain')
+
+    def test_views_are_measured(self):
+        '''Запросы учитываются в гистограммах своего представления.'''
+        self.staff_client.get(reverse('posts:index'))
+        self.staff_client.get(reverse('posts:index'))
+        self.staff_client.get(
+            reverse('posts:profile', args=(self.user.username,))
+        )
+        self.staff_client.get('/missing-page/')
+        text = self.staff_client.get(self.reverse_metrics).content.decode()
+        self.assertEqual(
+            self.sample(text, 'yatube_view_latency_seconds_count',
+                        'posts:index'), 2,
+        )
+        self.assertGreater(
+            self.sample(text, 'yatube_view_sql_queries_sum',
+                        'posts:profile'), 0,
+        )
+        self.assertGreater(
+            self.sample(text, 'yatube_view_render_seconds_sum',
+                        'posts:profile'), 0,
+        )
+        self.assertEqual(
+            self.sample(text, 'yatube_view_latency_seconds_count',
+                        '<unresolved>'), 1,
+        )
+        self.assertIn(
+            'yatube_view_sql_queries_bucket{view="posts:profile",le="+Inf"} 1',
+            text,
+        )
+        self.assertIn('# TYPE yatube_view_db_seconds histogram', text)
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+
+
+class SqlitePragmasTest(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        '''Соединение с SQLite настроено прагмами SQLITE_PRAGMAS.'''
+        pragmas = settings.SQLITE_PRAGMAS
+        self.assertEqual(
+            self.pragma('busy_timeout'), pragmas['busy_timeout']
+        )
+        self.assertEqual(self.pragma('cache_size'), pragmas['cache_size'])
+        # 1 — NORMAL, 2 — MEMORY
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('temp_store'), 2)
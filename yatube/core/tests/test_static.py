@@ -0,0 +1,116 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import Client, SimpleTestCase, override_settings
+
+from core import storage
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SOURCE_DIR = os.path.join(TEMP_DIR, 'source')
+STATIC_ROOT = os.path.join(TEMP_DIR, 'root')
+
+CSS = b'body { color: #333; }\n' * 100
+
+
+@override_settings(
+    STATICFILES_DIRS=[SOURCE_DIR],
+    STATIC_ROOT=STATIC_ROOT,
+    STATICFILES_STORAGE='core.storage.CompressedManifestStaticFilesStorage',
+)
+class StaticFilesTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(SOURCE_DIR, 'css'))
+        os.makedirs(os.path.join(SOURCE_DIR, 'img'))
+        with open(os.path.join(SOURCE_DIR, 'css', 'app.css'), 'wb') as file:
+            file.write(CSS)
+        with open(os.path.join(SOURCE_DIR, 'img', 'logo.png'), 'wb') as file:
+            file.write(b'\x89PNG' + b'\x00' * 1000)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.css = staticfiles_storage.stored_name('css/app.css')
+        self.url = staticfiles_storage.url('css/app.css')
+
+    def test_collectstatic_writes_hashed_compressed_files(self):
+        '''collectstatic пишет имя с хешем и сжатую копию рядом.'''
+        self.assertRegex(self.css, r'^css/app\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(STATIC_ROOT, self.css + '.gz'), 'rb') as file:
+            self.assertEqual(gzip.decompress(file.read()), CSS)
+        logo = staticfiles_storage.stored_name('img/logo.png')
+        self.assertFalse(os.path.exists(
+            os.path.join(STATIC_ROOT, logo + '.gz')
+        ))
+        rendered = Template(
+            "{% load static %}{% static 'css/app.css' %}"
+        ).render(Context())
+        self.assertEqual(rendered, self.url)
+
+    def test_hashed_file_served_compressed_and_immutable(self):
+        '''Файл с хешем отдаётся сжатым и кешируется навсегда.'''
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(
+            response['Cache-Control'], 'public, max-age=31536000, immutable'
+        )
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)), CSS
+        )
+        self.assertNotIn('Set-Cookie', response)
+
+    def test_identity_when_not_accepted(self):
+        '''Без gzip в Accept-Encoding отдаётся несжатый файл.'''
+        for header in ('', 'gzip;q=0', 'identity'):
+            with self.subTest(header=header):
+                response = self.client.get(
+                    self.url, HTTP_ACCEPT_ENCODING=header
+                )
+                self.assertNotIn('Content-Encoding', response)
+                self.assertEqual(b''.join(response.streaming_content), CSS)
+
+    @unittest.skipIf(storage.brotli is None, 'Brotli не установлен')
+    def test_brotli_preferred(self):
+        '''Если клиент принимает brotli, отдаётся копия .br.'''
+        response = self.client.get(
+            self.url, HTTP_ACCEPT_ENCODING='gzip, deflate, br'
+        )
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(storage.brotli.decompress(
+            b''.join(response.streaming_content)
+        ), CSS)
+
+    def test_unhashed_and_missing_files(self):
+        '''Файл без хеша кешируется ненадолго, отсутствующий — 404.'''
+        response = self.client.get(settings.STATIC_URL + 'css/app.css')
+        self.assertEqual(
+            response['Cache-Control'],
+            f'public, max-age={settings.STATIC_MAX_AGE}',
+        )
+        for name in ('css/missing.css', '../source/css/app.css'):
+            with self.subTest(name=name):
+                response = self.client.get(settings.STATIC_URL + name)
+                self.assertEqual(response.status_code, 404)
+
+    def test_not_modified(self):
+        '''Повторный запрос с If-Modified-Since получает 304.'''
+        response = self.client.get(self.url)
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
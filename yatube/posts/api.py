@@ -0,0 +1,85 @@
+"""Лента постов в JSON для мобильных клиентов.
+
+Ответы поддерживают условные запросы: ETag и Last-Modified считаются
+одним агрегатом по индексу (posts.conditional), и неизменившаяся лента
+отдаётся как 304 без выборки постов.
+"""
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+
+from core.conditional import conditional_page
+
+from .conditional import follow_state, group_state, index_state, profile_state
+from .models import Group, Post, User
+from .thumbnails import post_renditions, post_thumbnail
+from .timeline import home_timeline
+from .utils import CursorPaginator
+
+
+def serialize_post(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'comments': post.comments_count,
+        'image': post.image.url if post.image else None,
+        'thumbnail': post_thumbnail(post),
+        'renditions': [
+            {'width': width, 'height': height, 'url': url}
+            for width, height, url in post_renditions(post) or ()
+        ],
+    }
+
+
+def feed_response(request, posts, field='-pub_date', tiebreak='pk'):
+    paginator = CursorPaginator(
+        posts.select_related('group', 'author'),
+        settings.NUMBER_OF_POST, field, tiebreak,
+    )
+    page_obj = paginator.get_cursor_page(request.GET)
+    return JsonResponse({
+        'results': [serialize_post(post) for post in page_obj],
+        'next': (
+            f'{request.path}?{paginator.next_query}'
+            if page_obj.has_next() else None
+        ),
+        'previous': (
+            f'{request.path}?{paginator.previous_query}'
+            if page_obj.number > 1 else None
+        ),
+    })
+
+
+@require_safe
+@conditional_page(index_state)
+def index(request):
+    return feed_response(request, Post.objects.all())
+
+
+@require_safe
+@conditional_page(group_state)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, group.posts.all())
+
+
+@require_safe
+@conditional_page(profile_state)
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, author.posts.all())
+
+
+@require_safe
+@login_required
+@conditional_page(follow_state)
+def follow_index(request):
+    return feed_response(
+        request, home_timeline(request.user),
+        field='-timeline_date', tiebreak='timeline_id',
+    )
@@ -0,0 +1,86 @@
+"""Метаданные страниц для условных GET-запросов.
+
+Каждая функция — один индексированный запрос (плюс обращения к кешу),
+результат которого меняется вместе с содержимым страницы. Правки
+постов и групп не меняют pub_date, поэтому в состояние входит
+поколение кеша, которое они сбрасывают.
+"""
+from django.db.models import Max, OuterRef, Subquery
+
+from core.cache import get_cache_version, get_cache_versions
+
+from .following import is_following
+from .models import Post, TimelineEntry, User
+from .timeline import followed_celebrities
+
+
+def _newest(posts):
+    return posts.aggregate(newest=Max('pub_date'))['newest']
+
+
+def index_state(request):
+    return (
+        _newest(Post.objects.all()),
+        get_cache_version('index_page'),
+    )
+
+
+def group_state(request, slug):
+    return (
+        _newest(Post.objects.filter(group__slug=slug)),
+        get_cache_version('index_page'),
+    )
+
+
+def profile_state(request, username):
+    newest = Post.objects.filter(author=OuterRef('pk')).order_by(
+        '-pub_date'
+    ).values('pub_date')[:1]
+    row = User.objects.filter(username=username).values_list(
+        'pk',
+        Subquery(newest),
+        'counters__posts',
+        'counters__followers',
+        'counters__following',
+    ).first()
+    if row is None:
+        return (None,)
+    author_id, *row = row
+    # От подписки читателя зависит кнопка «Подписаться»/«Отписаться».
+    following = (
+        request.user.is_authenticated
+        and is_following(request.user.pk, author_id)
+    )
+    return (*row, following, get_cache_version('index_page'))
+
+
+def follow_state(request):
+    if not request.user.is_authenticated:
+        return (None,)
+    # Посты популярных авторов лента подмешивает при чтении.
+    newest = [
+        _newest(TimelineEntry.objects.filter(user=request.user)),
+    ]
+    celebrities = followed_celebrities(request.user.pk)
+    if celebrities:
+        newest.append(_newest(Post.objects.filter(author_id__in=celebrities)))
+    newest = [date for date in newest if date is not None]
+    return (max(newest, default=None), get_cache_version('index_page'))
+
+
+def post_detail_state(request, post_id):
+    row = Post.objects.filter(pk=post_id).values_list(
+        'author__counters__posts', 'author_id', 'group_id', 'image',
+    ).first()
+    if row is None:
+        return (None,)
+    author_posts, author_id, group_id, image = row
+    # Те же поколения, что у карточки поста, см. templatetags/post_cards.py;
+    # число комментариев не годится: добавить один и удалить другой.
+    names = [
+        f'post:{post_id}', f'user:{author_id}', f'group:{group_id or 0}',
+        f'comments:{post_id}',
+    ]
+    if image:
+        names.append(f'image:{image}')
+    return (None, author_posts, *get_cache_versions(names))
@@ -0,0 +1,73 @@
+"""Денормализованные счётчики постов, комментариев и подписок."""
+from collections import defaultdict
+
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+
+from .models import Follow, Post, UserCounters
+
+# Поле UserCounters: (модель-источник, поле пользователя в ней)
+USER_COUNTERS = {
+    'posts': (Post, 'author'),
+    'followers': (Follow, 'author'),
+    'following': (Follow, 'user'),
+}
+
+
+def _shifted(field, delta):
+    return Greatest(F(field) + delta, Value(0))
+
+
+def bump_user(user_id, **deltas):
+    """Сдвигает счётчики пользователя на deltas одним UPDATE."""
+    updates = {
+        field: _shifted(field, delta) for field, delta in deltas.items()
+    }
+    counters = UserCounters.objects.filter(user_id=user_id)
+    if counters.update(**updates):
+        return
+    # Строку заводим только при росте: при удалении пользователя
+    # каскад не должен создавать счётчики заново.
+    if any(delta > 0 for delta in deltas.values()):
+        UserCounters.objects.get_or_create(user_id=user_id)
+        counters.update(**updates)
+
+
+def bump_post_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=_shifted('comments_count', delta)
+    )
+
+
+def get_counters(user):
+    """Счётчики пользователя; без строки в таблице — нулевые."""
+    return (
+        UserCounters.objects.filter(user=user).first()
+        or UserCounters(user=user)
+    )
+
+
+def user_counters_drift():
+    """Пары (user_id, верные значения) для разошедшихся счётчиков."""
+    actual = defaultdict(dict)
+    for field, (model, column) in USER_COUNTERS.items():
+        rows = model.objects.values_list(column).annotate(Count('pk'))
+        for user_id, count in rows.order_by():
+            actual[user_id][field] = count
+    stored = {
+        row.pop('user_id'): row
+        for row in UserCounters.objects.values('user_id', *USER_COUNTERS)
+    }
+    for user_id in actual.keys() | stored.keys():
+        expected = {
+            field: actual[user_id].get(field, 0) for field in USER_COUNTERS
+        }
+        if stored.get(user_id, dict.fromkeys(USER_COUNTERS, 0)) != expected:
+            yield user_id, expected
+
+
+def post_counters_drift():
+    """Пары (post_id, верное число комментариев) с расхождением."""
+    return Post.objects.annotate(
+        actual=Count('comments')
+    ).exclude(comments_count=F('actual')).values_list('pk', 'actual')
@@ -0,0 +1,66 @@
+"""Авторы, на которых подписан пользователь, в кеше.
+
+Идентификаторы хранятся отсортированным array('q'): восемь байт на
+подписку, проверка подписки — двоичный поиск. Ключ включает поколение
+following:<user_id>, поэтому после подписки или отписки все процессы
+сразу читают новый массив.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.cache import bump_cache_version, get_cache_version
+
+from .models import Follow
+
+
+def _name(user_id):
+    return f'following:{user_id}'
+
+
+def _key(user_id):
+    return f'{_name(user_id)}.{get_cache_version(_name(user_id))}'
+
+
+def followed_ids(user_id):
+    """Отсортированный array('q') id авторов, на которых подписан user_id."""
+    key = _key(user_id)
+    ids = cache.get(key)
+    if ids is None:
+        # Сортировка здесь: индекс только по user_id.
+        ids = array('q', sorted(Follow.objects.filter(
+            user_id=user_id
+        ).values_list('author_id', flat=True)))
+        cache.set(key, ids, settings.FOLLOWING_CACHE_TIMEOUT)
+    return ids
+
+
+def contains(ids, author_id):
+    index = bisect_left(ids, author_id)
+    return index < len(ids) and ids[index] == author_id
+
+
+def is_following(user_id, author_id):
+    return contains(followed_ids(user_id), author_id)
+
+
+def forget(user_id):
+    """Сбрасывает массив; следующее чтение соберёт его заново."""
+    bump_cache_version(_name(user_id))
+
+
+def refresh(user_id):
+    """Обновляет массив после подписки или отписки user_id.
+
+    Сброс сразу нужен, чтобы сама транзакция видела изменение, а сброс
+    после коммита — потому что параллельный запрос мог до коммита
+    собрать массив из старых данных.
+    """
+    def rebuild():
+        forget(user_id)
+        followed_ids(user_id)
+    forget(user_id)
+    transaction.on_commit(rebuild)
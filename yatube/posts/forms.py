@@ -1,10 +1,19 @@
+import os
+
 from django import forms
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
 from django.utils.translation import gettext_lazy as _
+from PIL import Image
 
+from .images import ingest
 from .models import Comment, Post
 
 
 class PostForm(forms.ModelForm):
+    original_image = None
+
     class Meta:
         model = Post
         fields = ('text', 'group', 'image',)
@@ -14,6 +23,40 @@ class PostForm(forms.ModelForm):
             'image': _('Изображение в новом посте'),
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Только новая загрузка: не уже сохранённый файл и не очистка.
+        if isinstance(image, UploadedFile):
+            try:
+                processed = ingest(image)
+            except (OSError, Image.DecompressionBombError):
+                # Заголовок прошёл проверку ImageField, а данные нет:
+                # файл обрезан или слишком велик.
+                raise forms.ValidationError(
+                    _('Не удалось прочитать картинку: файл повреждён '
+                      'или слишком большой.'),
+                    code='invalid_image',
+                )
+            if processed is not None:
+                self.original_image = image
+                return processed
+        return image
+
+    def _save_m2m(self):
+        # Вызывается после сохранения поста: при commit=True из save(),
+        # при commit=False — из save_m2m() после post.save() во view.
+        # Так исходник не остаётся без поста.
+        super()._save_m2m()
+        if self.original_image and settings.POST_IMAGE_KEEP_ORIGINALS:
+            self.original_image.seek(0)
+            default_storage.save(
+                os.path.join(
+                    settings.POST_IMAGE_ORIGINALS_DIR,
+                    os.path.basename(self.original_image.name),
+                ),
+                self.original_image,
+            )
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
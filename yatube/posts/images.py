@@ -0,0 +1,68 @@
+"""Подготовка загруженных картинок постов перед сохранением.
+
+Картинка поворачивается по EXIF, уменьшается до POST_IMAGE_MAX_SIZE
+по длинной стороне и пересохраняется в POST_IMAGE_FORMAT с качеством
+POST_IMAGE_QUALITY. Метаданные (EXIF, GPS, профиль камеры) в новый
+файл не переносятся. Анимированные картинки не трогаются: Pillow
+сохранил бы только первый кадр.
+"""
+import math
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+
+def _prepare_mode(image, format):
+    has_alpha = image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+    if format == 'JPEG':
+        if not has_alpha:
+            return image.convert('RGB')
+        # У JPEG нет прозрачности: прозрачное становится белым.
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def encode(file):
+    """Байты обработанной картинки file или None для анимации."""
+    file.seek(0)
+    with Image.open(file) as source:
+        if getattr(source, 'is_animated', False):
+            return None
+        size = settings.POST_IMAGE_MAX_SIZE
+        # JPEG декодируется сразу в уменьшенном масштабе, но не меньше
+        # итогового размера.
+        scale = min(1, size / max(source.size))
+        source.draft('RGB', tuple(
+            math.ceil(side * scale) for side in source.size
+        ))
+        image = ImageOps.exif_transpose(source)
+        image.thumbnail((size, size), Image.LANCZOS)
+        format = settings.POST_IMAGE_FORMAT
+        image = _prepare_mode(image, format)
+        buffer = BytesIO()
+        image.save(
+            buffer, format,
+            quality=settings.POST_IMAGE_QUALITY,
+            optimize=True,
+        )
+    return buffer.getvalue()
+
+
+def ingest(file):
+    """Новый файл вместо загруженного file или None, если он не менялся."""
+    data = encode(file)
+    if data is None:
+        return None
+    stem = os.path.splitext(os.path.basename(file.name))[0]
+    extension = EXTENSIONS[settings.POST_IMAGE_FORMAT]
+    return ContentFile(data, name=f'{stem}.{extension}')
@@ -0,0 +1,318 @@
+"""Потоковый импорт пользователей, групп, постов и подписок из NDJSON.
+
+Каждая строка входного файла — один объект:
+
+    {"type": "user", "username": "leo", "first_name": "Лев"}
+    {"type": "group", "slug": "cats", "title": "Коты", "description": ""}
+    {"type": "post", "author": "leo", "group": "cats", "text": "...",
+     "pub_date": "2021-05-01T10:00:00+03:00",
+     "comments": [{"author": "leo", "text": "...", "created": "..."}]}
+    {"type": "follow", "user": "leo", "author": "ann"}
+
+Записи копятся в пачки и пишутся bulk_create в одной транзакции.
+Авторы и группы ищутся по словарям username -> id и slug -> id, поэтому
+память зависит от числа пользователей и групп, но не от размера файла.
+
+Ключи постов и комментариев назначаются заранее и вместе с позицией
+в файле сохраняются в контрольной точке после каждой пачки. Повторный
+запуск продолжает с неё, а пачку, записанную до сбоя, узнаёт по ключам
+и пропускает. Во время импорта сайт не должен создавать посты.
+"""
+import json
+import os
+from collections import Counter
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Case, Max, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.cache import bump_cache_version
+
+from . import counters, following, media, search, timeline
+from .models import Comment, Follow, Group, Post, User
+
+RECORD_TYPES = ('user', 'group', 'post', 'follow')
+
+
+class RecordError(ValueError):
+    """Запись, которую нельзя импортировать."""
+
+
+def bulk_create_dated(model, objects, field_name):
+    """bulk_create с датами из файла в поле с auto_now_add.
+
+    bulk_create ставит в такое поле текущее время. Даты возвращаются
+    в объекты и записываются UPDATE … CASE пачками, которые влезают
+    в лимит параметров запроса.
+    """
+    dates = [getattr(obj, field_name) for obj in objects]
+    model.objects.bulk_create(objects)
+    if not objects:
+        return
+    field = model._meta.get_field(field_name)
+    for obj, date in zip(objects, dates):
+        setattr(obj, field_name, date)
+    size = connection.ops.bulk_batch_size(['pk', field_name, 'pk'], objects)
+    for start in range(0, len(objects), size):
+        chunk = objects[start:start + size]
+        model.objects.filter(pk__in=[obj.pk for obj in chunk]).update(**{
+            field_name: Case(
+                *(
+                    When(pk=obj.pk, then=Value(
+                        getattr(obj, field_name), output_field=field
+                    ))
+                    for obj in chunk
+                ),
+                output_field=field,
+            ),
+        })
+
+
+def parse_date(value):
+    if value is None:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise RecordError(f'неверная дата {value!r}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def next_pk(model):
+    return (model.objects.aggregate(Max('pk'))['pk__max'] or 0) + 1
+
+
+class Checkpoint:
+    """Позиция в файле и следующие ключи постов и комментариев."""
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.line = 0
+        self.post_pk = None
+        self.comment_pk = None
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                state = json.load(file)
+            self.offset, self.line = state['offset'], state['line']
+            self.post_pk = state['post_pk']
+            self.comment_pk = state['comment_pk']
+
+    def save(self):
+        if not self.path:
+            return
+        state = {
+            'offset': self.offset,
+            'line': self.line,
+            'post_pk': self.post_pk,
+            'comment_pk': self.comment_pk,
+        }
+        # Запись через временный файл: контрольная точка не бывает
+        # наполовину записанной.
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(state, file)
+        os.replace(temporary, self.path)
+
+
+class Importer:
+    def __init__(self, checkpoint, batch_size=1000, log=print):
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.log = log
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        if checkpoint.post_pk is None:
+            checkpoint.post_pk = next_pk(Post)
+            checkpoint.comment_pk = next_pk(Comment)
+        self.stats = Counter()
+        self.batch = []
+
+    def run(self, path):
+        with open(path, 'rb') as file:
+            file.seek(self.checkpoint.offset)
+            offset, line = self.checkpoint.offset, self.checkpoint.line
+            for raw in file:
+                offset += len(raw)
+                line += 1
+                if raw.strip():
+                    self.batch.append((line, raw))
+                if len(self.batch) >= self.batch_size:
+                    self.flush(offset, line)
+            self.flush(offset, line)
+        self.finish()
+        return self.stats
+
+    def flush(self, offset, line):
+        records = {record_type: [] for record_type in RECORD_TYPES}
+        for number, raw in self.batch:
+            try:
+                record = json.loads(raw)
+                records[record['type']].append((number, record))
+            except (ValueError, KeyError, TypeError) as error:
+                self.skip(number, f'неверная запись: {error}')
+        with transaction.atomic():
+            # Порядок важен: посты и подписки ссылаются на пользователей
+            # и группы из той же пачки.
+            self.import_users(records['user'])
+            self.import_groups(records['group'])
+            self.import_posts(records['post'])
+            self.import_follows(records['follow'])
+        self.batch = []
+        self.checkpoint.offset, self.checkpoint.line = offset, line
+        self.checkpoint.save()
+
+    def skip(self, number, reason):
+        self.stats['skipped'] += 1
+        self.log(f'строка {number}: {reason}')
+
+    def resolve(self, mapping, key, kind):
+        try:
+            return mapping[key]
+        except KeyError:
+            raise RecordError(f'нет {kind} {key!r}')
+
+    def build(self, records, factory):
+        objects = []
+        for number, record in records:
+            try:
+                objects.append(factory(record))
+            except (ValueError, KeyError, TypeError) as error:
+                self.skip(number, error)
+        return objects
+
+    def import_users(self, records):
+        # Повторы внутри пачки схлопываются, последний выигрывает.
+        users = list({
+            user.username: user
+            for user in self.build(records, lambda record: User(
+                username=record['username'],
+                first_name=record.get('first_name', ''),
+                last_name=record.get('last_name', ''),
+                email=record.get('email', ''),
+                password='!',
+            ))
+            if user.username not in self.users
+        }.values())
+        User.objects.bulk_create(users)
+        self.users.update(User.objects.filter(
+            username__in=[user.username for user in users]
+        ).values_list('username', 'pk'))
+        self.stats['user'] += len(users)
+
+    def import_groups(self, records):
+        groups = list({
+            group.slug: group
+            for group in self.build(records, lambda record: Group(
+                slug=record['slug'],
+                title=record['title'],
+                description=record.get('description', ''),
+            ))
+            if group.slug not in self.groups
+        }.values())
+        Group.objects.bulk_create(groups)
+        self.groups.update(Group.objects.filter(
+            slug__in=[group.slug for group in groups]
+        ).values_list('slug', 'pk'))
+        self.stats['group'] += len(groups)
+
+    def build_post(self, record):
+        group = record.get('group')
+        comments = [
+            Comment(
+                author_id=self.resolve(self.users, comment['author'],
+                                       'автора комментария'),
+                text=comment['text'],
+                created=parse_date(comment.get('created')),
+            )
+            for comment in record.get('comments', ())
+        ]
+        post = Post(
+            author_id=self.resolve(self.users, record['author'], 'автора'),
+            group_id=(
+                self.resolve(self.groups, group, 'группы') if group else None
+            ),
+            text=record['text'],
+            image=record.get('image', ''),
+            pub_date=parse_date(record.get('pub_date')),
+            comments_count=len(comments),
+        )
+        post.imported_comments = comments
+        return post
+
+    def import_posts(self, records):
+        posts = self.build(records, self.build_post)
+        comments = []
+        for post in posts:
+            post.pk = self.checkpoint.post_pk
+            self.checkpoint.post_pk += 1
+            for comment in post.imported_comments:
+                comment.pk = self.checkpoint.comment_pk
+                comment.post_id = post.pk
+                self.checkpoint.comment_pk += 1
+                comments.append(comment)
+        # Пачка могла быть записана до сбоя, но после контрольной точки.
+        existing = set(Post.objects.filter(
+            pk__in=[post.pk for post in posts]
+        ).values_list('pk', flat=True))
+        posts = [post for post in posts if post.pk not in existing]
+        comments = [
+            comment for comment in comments
+            if comment.post_id not in existing
+        ]
+        bulk_create_dated(Post, posts, 'pub_date')
+        bulk_create_dated(Comment, comments, 'created')
+        for author_id, count in Counter(
+            post.author_id for post in posts
+        ).items():
+            counters.bump_user(author_id, posts=count)
+        for name, count in Counter(
+            post.image.name for post in posts if post.image
+        ).items():
+            media.acquire(name, count)
+        timeline.fan_out_many(posts)
+        if posts and search.fts_available():
+            search.index_posts(posts)
+        self.stats['post'] += len(posts)
+        self.stats['comment'] += len(comments)
+
+    def import_follows(self, records):
+        pairs = [
+            (user, author)
+            for user, author in dict.fromkeys(self.build(
+                records, lambda record: (
+                    self.resolve(self.users, record['user'], 'пользователя'),
+                    self.resolve(self.users, record['author'], 'автора'),
+                )
+            ))
+            if user != author
+        ]
+        existing = set(Follow.objects.filter(
+            author_id__in={author for _, author in pairs},
+            user_id__in={user for user, _ in pairs},
+        ).values_list('user_id', 'author_id'))
+        pairs = [pair for pair in pairs if pair not in existing]
+        Follow.objects.bulk_create(
+            Follow(user_id=user, author_id=author) for user, author in pairs
+        )
+        for user_id, count in Counter(user for user, _ in pairs).items():
+            counters.bump_user(user_id, following=count)
+        for author_id, count in Counter(author for _, author in pairs).items():
+            counters.bump_user(author_id, followers=count)
+        timeline.backfill_many(pairs)
+        for user_id in {user for user, _ in pairs}:
+            following.forget(user_id)
+        self.stats['follow'] += len(pairs)
+
+    def finish(self):
+        # Ключи задавались вручную, счётчики последовательностей
+        # (в PostgreSQL) нужно сдвинуть за них.
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), [Post, Comment]
+            ):
+                cursor.execute(sql)
+        bump_cache_version('index_page')
@@ -0,0 +1,68 @@
+import argparse
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exporter import (
+    EXPORTS, FORMATS, byte_chunks, export_lines, parse_since,
+)
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError('нужно целое число больше нуля')
+    return number
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты, комментарии или подписки в NDJSON или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=EXPORTS)
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument(
+            '--output',
+            default='-',
+            help='Файл для выгрузки, по умолчанию stdout.',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Сжать выгрузку; включается сам для файлов *.gz.',
+        )
+        parser.add_argument(
+            '--since',
+            help='Только строки с датой не раньше этой (ISO 8601).',
+        )
+        parser.add_argument(
+            '--after-id',
+            type=int,
+            default=0,
+            help='Только строки с id больше этого, для любых таблиц.',
+        )
+        parser.add_argument('--chunk-size', type=positive_int, default=2000)
+
+    def handle(self, *args, **options):
+        output = options['output']
+        try:
+            lines = export_lines(
+                options['table'],
+                format=options['format'],
+                since=parse_since(options['since']),
+                after_id=options['after_id'],
+                chunk_size=options['chunk_size'],
+            )
+            chunks = byte_chunks(
+                lines, gzip=options['gzip'] or output.endswith('.gz')
+            )
+            if output == '-':
+                for chunk in chunks:
+                    sys.stdout.buffer.write(chunk)
+                sys.stdout.buffer.flush()
+                return
+            with open(output, 'wb') as file:
+                for chunk in chunks:
+                    file.write(chunk)
+        except (ValueError, OSError) as error:
+            raise CommandError(error)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import post_renditions, schedule
+
+
+class Command(BaseCommand):
+    help = ('Ставит в очередь миниатюры картинок постов, у которых '
+            'версий ещё нет, например загруженных до фоновой обработки.')
+
+    def handle(self, *args, **options):
+        names = set()
+        posts = Post.objects.exclude(image='').only(
+            'image', 'image_renditions'
+        )
+        for post in posts.iterator():
+            if post_renditions(post) is None:
+                names.add(post.image.name)
+        for name in sorted(names):
+            schedule(name)
+        self.stdout.write(
+            self.style.SUCCESS(f'Картинок в очереди: {len(names)}')
+        )
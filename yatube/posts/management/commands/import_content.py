@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importer import Checkpoint, Importer
+
+
+class Command(BaseCommand):
+    help = ('Импортирует пользователей, группы, посты с комментариями '
+            'и подписки из NDJSON-файла.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='NDJSON-файл, объект на строку.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк писать в одной транзакции.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки, по умолчанию <path>.checkpoint.',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Начать с начала файла, не читая контрольную точку.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        checkpoint_path = options['checkpoint'] or f'{path}.checkpoint'
+        checkpoint = Checkpoint(
+            None if options['restart'] else checkpoint_path
+        )
+        checkpoint.path = checkpoint_path
+        if checkpoint.line:
+            self.stdout.write(f'Продолжение со строки {checkpoint.line + 1}')
+        importer = Importer(
+            checkpoint,
+            batch_size=options['batch_size'],
+            log=self.stderr.write,
+        )
+        try:
+            stats = importer.run(path)
+        except OSError as error:
+            raise CommandError(error)
+        for kind in ('user', 'group', 'post', 'comment', 'follow', 'skipped'):
+            self.stdout.write(f'{kind}: {stats[kind]}')
+        self.stdout.write(self.style.SUCCESS('Импорт завершён'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import post_counters_drift, user_counters_drift
+from posts.models import Post, UserCounters
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счётчики с данными и исправляет их.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, ничего не исправлять.',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        drift = 0
+        with transaction.atomic():
+            for user_id, expected in user_counters_drift():
+                drift += 1
+                self.stdout.write(f'user {user_id}: {expected}')
+                if not dry_run:
+                    UserCounters.objects.update_or_create(
+                        user_id=user_id, defaults=expected
+                    )
+            for post_id, actual in list(post_counters_drift()):
+                drift += 1
+                self.stdout.write(f'post {post_id}: comments={actual}')
+                if not dry_run:
+                    Post.objects.filter(pk=post_id).update(
+                        comments_count=actual
+                    )
+        action = 'найдено' if dry_run else 'исправлено'
+        self.stdout.write(self.style.SUCCESS(f'Расхождений {action}: {drift}'))
@@ -0,0 +1,32 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.db_router import PRIMARY, REPLICA
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файл реплики. Заменяет '
+        'репликацию при локальной проверке чтения из реплики.'
+    )
+
+    def handle(self, *args, **options):
+        primary, replica = connections[PRIMARY], connections[REPLICA]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError('Команда работает только с SQLite.')
+        target = replica.settings_dict['NAME']
+        if target == primary.settings_dict['NAME']:
+            raise CommandError(
+                'Реплика указывает на основную базу, '
+                'задайте YATUBE_REPLICA_DB.'
+            )
+        replica.close()
+        primary.ensure_connection()
+        destination = sqlite3.connect(target)
+        try:
+            primary.connection.backup(destination)
+        finally:
+            destination.close()
+        self.stdout.write(self.style.SUCCESS(f'Реплика обновлена: {target}'))
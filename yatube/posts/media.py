@@ -0,0 +1,121 @@
+"""Счётчики ссылок постов на файлы картинок и сборка мусора.
+
+Одинаковые картинки хранятся одним файлом (core.storage), поэтому при
+удалении поста или замене картинки файл не удаляется: уменьшается
+MediaFile.references. Файлы без ссылок дольше grace секунд удаляет
+collect (команда collect_media) вместе с миниатюрами sorl.
+"""
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from sorl import thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from .models import MediaFile, Post
+
+storage = Post._meta.get_field('image').storage
+
+
+def acquire(name, count=1):
+    """Добавляет count ссылок на файл name."""
+    MediaFile.objects.get_or_create(name=name)
+    MediaFile.objects.filter(name=name).update(
+        references=F('references') + count, released=None,
+    )
+
+
+def release(name, count=1):
+    """Убирает count ссылок на файл name."""
+    MediaFile.objects.filter(name=name).update(
+        references=Greatest(F('references') - count, Value(0)),
+    )
+    MediaFile.objects.filter(
+        name=name, references=0, released=None,
+    ).update(released=timezone.now())
+
+
+def _stale(name, cutoff):
+    return (
+        not storage.exists(name)
+        or storage.get_modified_time(name) < cutoff
+    )
+
+
+def _size(name):
+    return storage.size(name) if storage.exists(name) else 0
+
+
+def _remove(name):
+    size = _size(name)
+    # Удаляет и миниатюры, и записи о них в KV-хранилище.
+    thumbnail.delete(ImageFile(name, storage))
+    return size
+
+
+def released_files(cutoff):
+    """Файлы из MediaFile без ссылок с момента раньше cutoff."""
+    return list(MediaFile.objects.filter(
+        references=0, released__lt=cutoff,
+    ).values_list('name', flat=True))
+
+
+def untracked_files(directory, cutoff, batch_size=500):
+    """Файлы в directory, о которых нет ни MediaFile, ни поста.
+
+    Такие остаются от старых загрузок и от сохранений, сорвавшихся
+    после записи файла.
+    """
+    def walk(path):
+        directories, files = storage.listdir(path)
+        for name in files:
+            yield os.path.join(path, name)
+        for name in directories:
+            subdirectory = os.path.join(path, name)
+            if subdirectory.rstrip('/') + '/' != originals:
+                yield from walk(subdirectory)
+
+    originals = settings.POST_IMAGE_ORIGINALS_DIR
+    if not storage.exists(directory):
+        return
+    names = [name for name in walk(directory) if _stale(name, cutoff)]
+    for start in range(0, len(names), batch_size):
+        batch = names[start:start + batch_size]
+        known = set(MediaFile.objects.filter(
+            name__in=batch,
+        ).values_list('name', flat=True))
+        known.update(Post.objects.filter(
+            image__in=batch,
+        ).values_list('image', flat=True))
+        yield from (name for name in batch if name not in known)
+
+
+def collect(grace=None, dry_run=False):
+    """Удаляет файлы без ссылок; возвращает (число файлов, байт)."""
+    if grace is None:
+        grace = settings.MEDIA_GC_GRACE
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    files = freed = 0
+    for name in released_files(cutoff):
+        # Те же байты могли загрузить снова, а пост ещё не сохранён.
+        if not _stale(name, cutoff):
+            continue
+        if dry_run:
+            files += 1
+            freed += _size(name)
+            continue
+        # Ссылка могла появиться после выборки.
+        deleted, _ = MediaFile.objects.filter(
+            name=name, references=0,
+        ).delete()
+        if deleted:
+            files += 1
+            freed += _remove(name)
+    upload_to = Post._meta.get_field('image').upload_to
+    for name in untracked_files(upload_to, cutoff):
+        files += 1
+        freed += _size(name) if dry_run else _remove(name)
+    return files, freed
@@ -0,0 +1,57 @@
+# Generated by Django 2.2.16 on 2026-10-17 11:00
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    counters = {}
+    sources = (
+        ('posts', Post, 'author'),
+        ('followers', Follow, 'author'),
+        ('following', Follow, 'user'),
+    )
+    for field, model, column in sources:
+        rows = model.objects.values_list(column).annotate(Count('pk'))
+        for user_id, count in rows.order_by():
+            if user_id is not None:
+                counters.setdefault(user_id, {})[field] = count
+    UserCounters.objects.bulk_create(
+        UserCounters(user_id=user_id, **values)
+        for user_id, values in counters.items()
+    )
+    rows = Comment.objects.values_list('post').annotate(Count('pk'))
+    for post_id, count in rows.order_by():
+        Post.objects.filter(pk=post_id).update(comments_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0009_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.CreateModel(
+            name='UserCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts', models.PositiveIntegerField(default=0)),
+                ('followers', models.PositiveIntegerField(default=0)),
+                ('following', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-17 12:00
+
+from django.db import migrations
+
+
+def create_fts(apps, schema_editor):
+    from posts.search import fts_available, rebuild
+    if fts_available(schema_editor.connection):
+        rebuild(schema_editor.connection)
+
+
+def drop_fts(apps, schema_editor):
+    from posts.search import FTS_TABLE, fts_available
+    if fts_available(schema_editor.connection):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
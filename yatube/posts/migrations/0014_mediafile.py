@@ -0,0 +1,46 @@
+# Generated by Django 2.2.16 on 2026-10-17 14:00
+
+import core.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_references(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    MediaFile = apps.get_model('posts', 'MediaFile')
+    rows = (
+        Post.objects.exclude(image='').values_list('image')
+        .annotate(Count('pk')).order_by()
+    )
+    MediaFile.objects.bulk_create(
+        [MediaFile(name=name, references=count) for name, count in rows],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('references', models.PositiveIntegerField(default=0)),
+                ('released', models.DateTimeField(blank=True, help_text='Когда ушла последняя ссылка', null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='mediafile',
+            index=models.Index(fields=['released'], name='mediafile_released_idx'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=core.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,92 @@
+"""Полнотекстовый поиск по постам через SQLite FTS5.
+
+Таблица posts_post_fts хранит текст поста под rowid, равным id поста,
+и обновляется сигналами Post. На других СУБД поиск работает через
+icontains.
+"""
+import re
+
+from django.db import connection
+
+FTS_TABLE = 'posts_post_fts'
+
+CREATE_SQL = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+    "text, tokenize='unicode61 remove_diacritics 2')"
+)
+
+
+def fts_available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def fts_query(text):
+    """Запрос пользователя в синтаксисе MATCH: все слова, по префиксу."""
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', text))
+
+
+def index_post(post):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text],
+        )
+
+
+def index_posts(posts):
+    """index_post для пачки новых постов."""
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [(post.pk, post.text) for post in posts],
+        )
+
+
+def unindex_post(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild(using=connection):
+    """Заново заполняет индекс из posts_post, возвращает число постов."""
+    with using.cursor() as cursor:
+        cursor.execute(CREATE_SQL)
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) '
+            'SELECT id, text FROM posts_post'
+        )
+        return cursor.rowcount
+
+
+def search_posts(queryset, text):
+    """Посты из queryset, подходящие под text, по убыванию релевантности."""
+    query = fts_query(text)
+    if not query:
+        return queryset.none()
+    if not fts_available():
+        return queryset.filter(text__icontains=text)
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = posts_post.id', f'{FTS_TABLE} MATCH %s'],
+        params=[query],
+        select={'rank': f'{FTS_TABLE}.rank'},
+        order_by=['rank'],
+    )
+
+
+def filter_posts(queryset, text):
+    """Фильтр без ранжирования — для поиска в админке."""
+    query = fts_query(text)
+    if not query:
+        return queryset.none()
+    if not fts_available():
+        return queryset.filter(text__icontains=text)
+    return queryset.extra(
+        where=[
+            f'posts_post.id IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)'
+        ],
+        params=[query],
+    )
@@ -0,0 +1,158 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from core.cache import bump_cache_version_on_commit
+
+from . import counters, following, media, search, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, User
+
+
+# Счётчики обновляются первыми: от них зависит выбор fan-out.
+@receiver(post_save, sender=Post)
+def post_counters_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.author_id, posts=1)
+
+
+@receiver(post_delete, sender=Post)
+def post_counters_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, posts=-1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_counters_created(sender, instance, created, raw=False,
+                             **kwargs):
+    if created and not raw:
+        counters.bump_post_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_counters_deleted(sender, instance, **kwargs):
+    counters.bump_post_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_counters_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.author_id, followers=1)
+        counters.bump_user(instance.user_id, following=1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_counters_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, followers=-1)
+    counters.bump_user(instance.user_id, following=-1)
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_trim(sender, instance, **kwargs):
+    timeline.trim(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def following_refresh(sender, instance, raw=False, **kwargs):
+    if not raw:
+        following.refresh(instance.user_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_index_page(sender, **kwargs):
+    bump_cache_version_on_commit('index_page')
+
+
+@receiver(post_save, sender=Post)
+def post_search_index(sender, instance, raw=False, update_fields=None,
+                      **kwargs):
+    if raw or not search.fts_available():
+        return
+    if update_fields is None or 'text' in update_fields:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_search_unindex(sender, instance, **kwargs):
+    if search.fts_available():
+        search.unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def post_thumbnails(sender, instance, raw=False, update_fields=None,
+                    **kwargs):
+    if raw or not instance.image:
+        return
+    if update_fields is None or 'image' in update_fields:
+        thumbnails.schedule(instance.image.name)
+
+
+# Ссылки постов на файлы картинок, см. posts/media.py
+@receiver(post_init, sender=Post)
+def post_image_remember(sender, instance, **kwargs):
+    # Берётся сырое значение: отложенное поле не должно грузиться.
+    image = instance.__dict__.get('image')
+    instance.stored_image = image if isinstance(image, str) else None
+
+
+@receiver(post_save, sender=Post)
+def post_image_references(sender, instance, created, raw=False, **kwargs):
+    stored = '' if created else instance.stored_image
+    if raw or stored is None:
+        return
+    image = instance.image.name or ''
+    if image == stored:
+        return
+    if image:
+        media.acquire(image)
+    if stored:
+        media.release(stored)
+    instance.stored_image = image
+
+
+@receiver(post_delete, sender=Post)
+def post_image_release(sender, instance, **kwargs):
+    if instance.stored_image:
+        media.release(instance.stored_image)
+
+
+# Поколение комментариев поста, см. conditional.post_detail_state
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comments_invalidate(sender, instance, **kwargs):
+    bump_cache_version_on_commit(f'comments:{instance.post_id}')
+
+
+# Поколения кеша карточек постов, см. templatetags/post_cards.py
+@receiver(post_save, sender=Post)
+def post_card_invalidate(sender, instance, **kwargs):
+    bump_cache_version_on_commit(f'post:{instance.pk}')
+
+
+@receiver(post_save, sender=Group)
+def group_cards_invalidate(sender, instance, **kwargs):
+    bump_cache_version_on_commit(f'group:{instance.pk}')
+
+
+@receiver(post_save, sender=User)
+def author_cards_invalidate(sender, instance, created=False,
+                            update_fields=None, **kwargs):
+    card_fields = {'username', 'first_name', 'last_name'}
+    if update_fields is None or card_fields & set(update_fields):
+        bump_cache_version_on_commit(f'user:{instance.pk}')
+        if not created:
+            # Имя автора есть на страницах лент в кеше страниц.
+            bump_cache_version_on_commit('index_page')
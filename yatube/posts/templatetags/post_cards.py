@@ -0,0 +1,29 @@
+from django import template
+from django.conf import settings
+
+from core.cache import get_cache_versions
+
+register = template.Library()
+
+
+def card_version_names(post):
+    """Кеши, от которых зависит карточка поста."""
+    names = [
+        f'post:{post.pk}',
+        f'user:{post.author_id}',
+        f'group:{post.group_id or 0}',
+    ]
+    if post.image:
+        # Поколение меняется, когда готова миниатюра вместо заглушки.
+        names.append(f'image:{post.image.name}')
+    return names
+
+
+@register.simple_tag
+def post_card(post):
+    """Ключ и время жизни кеша карточки поста для тега cache."""
+    versions = get_cache_versions(card_version_names(post))
+    return {
+        'key': '.'.join(map(str, [post.pk, *versions])),
+        'timeout': settings.POST_CARD_CACHE_TIMEOUT,
+    }
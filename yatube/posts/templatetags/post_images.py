@@ -0,0 +1,11 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_image(post):
+    """Атрибуты <img> картинки поста или None, пока версий нет."""
+    return thumbnails.post_image(post)
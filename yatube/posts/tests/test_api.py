@@ -0,0 +1,98 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Follow, Group, Post, User
+
+
+@override_settings(NUMBER_OF_POST=3)
+class FeedApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_api_user')
+        cls.author = User.objects.create_user(username='test_api_author')
+        cls.group = Group.objects.create(
+            title='test_api_group',
+            slug='test_api_slug',
+            description='Test description of test_api_group',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(5):
+            cls.post = Post.objects.create(
+                author=cls.author, text=f'Text_api{i}', group=cls.group,
+            )
+        cls.feeds = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=(cls.group.slug,)),
+            reverse('posts:api_profile', args=(cls.author.username,)),
+            reverse('posts:api_follow_index'),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feeds_paginate_by_cursor(self):
+        '''Ленты отдают компактные посты и ссылку на следующую страницу.'''
+        for url in self.feeds:
+            with self.subTest(url=url):
+                data = self.authorized_client.get(url).json()
+                self.assertEqual(
+                    [post['text'] for post in data['results']],
+                    ['Text_api4', 'Text_api3', 'Text_api2'],
+                )
+                self.assertEqual(data['results'][0], {
+                    'id': self.post.pk,
+                    'text': 'Text_api4',
+                    'pub_date': self.post.pub_date.isoformat(),
+                    'author': self.author.username,
+                    'group': self.group.slug,
+                    'comments': 0,
+                    'image': None,
+                    'thumbnail': None,
+                    'renditions': [],
+                })
+                self.assertIsNone(data['previous'])
+                data = self.authorized_client.get(data['next']).json()
+                self.assertEqual(
+                    [post['text'] for post in data['results']],
+                    ['Text_api1', 'Text_api0'],
+                )
+                self.assertIsNone(data['next'])
+
+    def test_unchanged_feed_is_not_modified(self):
+        '''Неизменившаяся лента отдаётся как 304 без выборки постов.'''
+        for url in self.feeds:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertIn('Last-Modified', response)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse([
+                    query for query in queries
+                    if '"posts_post"."text"' in query['sql']
+                ])
+
+    def test_etag_changes_with_posts(self):
+        '''Новый пост и правка поста меняют ETag.'''
+        url = self.feeds[0]
+        etag = self.authorized_client.get(url)['ETag']
+        self.post.text = 'Text_api_edited'
+        self.post.save()
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        Post.objects.create(author=self.author, text='Text_api_new')
+        self.assertNotEqual(
+            self.authorized_client.get(url)['ETag'], response['ETag']
+        )
+
+    def test_follow_feed_requires_login(self):
+        response = Client().get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, 302)
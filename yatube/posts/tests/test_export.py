@@ -0,0 +1,106 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Follow, Post, User
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_export_user')
+        cls.staff = User.objects.create_user(
+            username='test_export_staff', is_staff=True,
+        )
+        cls.posts = [
+            Post.objects.create(author=cls.user, text=f'Text_export{i}')
+            for i in range(5)
+        ]
+        Post.objects.filter(pk=cls.posts[0].pk).update(
+            pub_date=timezone.now() - timedelta(days=10)
+        )
+        Comment.objects.create(
+            post=cls.posts[1], author=cls.staff, text='Comment, "quoted"',
+        )
+        Follow.objects.create(user=cls.staff, author=cls.user)
+
+    def setUp(self):
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def export(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, options.pop('filename', 'out'))
+            call_command('export_content', *args, output=output, **options)
+            with open(output, 'rb') as file:
+                return file.read()
+
+    def test_ndjson_in_chunks(self):
+        '''Выгрузка по пачкам первичного ключа отдаёт все строки.'''
+        data = self.export('posts', chunk_size=2).decode()
+        rows = [json.loads(line) for line in data.splitlines()]
+        self.assertEqual([row['id'] for row in rows],
+                         [post.pk for post in self.posts])
+        self.assertEqual(rows[1]['comments_count'], 1)
+        self.assertEqual(rows[1]['pub_date'],
+                         self.posts[1].pub_date.isoformat())
+
+    def test_csv_gzip_since_and_after_id(self):
+        '''CSV с gzip и инкрементальные выгрузки.'''
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        data = gzip.decompress(
+            self.export('posts', format='csv', since=since,
+                        filename='posts.csv.gz')
+        ).decode()
+        rows = list(csv.DictReader(io.StringIO(data)))
+        self.assertEqual(len(rows), 4)
+        data = self.export('comments', format='csv').decode()
+        self.assertEqual(
+            list(csv.DictReader(io.StringIO(data)))[0]['text'],
+            'Comment, "quoted"',
+        )
+        data = self.export('posts', after_id=self.posts[3].pk).decode()
+        self.assertEqual(len(data.splitlines()), 1)
+
+    def test_chunk_size_must_be_positive(self):
+        '''Размер пачки меньше единицы — ошибка команды.'''
+        for value in ('0', '-1', 'many'):
+            with self.subTest(value=value):
+                with self.assertRaises(CommandError):
+                    call_command('export_content', 'posts',
+                                 '--chunk-size', value)
+
+    def test_endpoint_streams_for_staff(self):
+        '''Эндпоинт отдаёт поток только персоналу.'''
+        url = reverse('posts:export', args=('follows',))
+        user_client = Client()
+        user_client.force_login(self.user)
+        self.assertEqual(user_client.get(url).status_code, 302)
+        response = self.staff_client.get(url, {'gzip': '1'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename="follows.ndjson.gz"',
+        )
+        row = json.loads(gzip.decompress(b''.join(response.streaming_content)))
+        self.assertEqual(row['user_id'], self.staff.pk)
+        self.assertEqual(
+            self.staff_client.get(url, {'since': '2021-01-01'}).status_code,
+            400,
+        )
+        self.assertEqual(
+            self.staff_client.get(
+                reverse('posts:export', args=('users',))
+            ).status_code,
+            404,
+        )
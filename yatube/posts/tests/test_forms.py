@@ -1,11 +1,15 @@
+import os
 import tempfile
 import shutil
+from io import BytesIO
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from ..forms import PostForm
 from ..models import Comment, Group, Post, User
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -83,7 +87,10 @@ class PostCreateFormTests(TestCase):
         post = Post.objects.first()
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.group.pk, form_data['group'])
-        self.assertEqual(post.image, f'posts/{post_image}')
+        # Картинка пересохраняется в POST_IMAGE_FORMAT (WebP) и
+        # называется по хешу содержимого.
+        self.assertRegex(post.image.name, hashed_name('webp'))
+        self.assertNotEqual(post.image.name, f'posts/{post_image}')
 
     def test_post_edit(self):
         """Проверка формы редактирования поста."""
@@ -132,3 +139,106 @@ class PostCreateFormTests(TestCase):
             follow=True,
         )
         self.assertEqual(Comment.objects.count(), 0)
+
+
+def upload(name, image, format, **params):
+    buffer = BytesIO()
+    image.save(buffer, format, **params)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+def hashed_name(extension):
+    """Имя файла по SHA-256 содержимого, см. core.storage."""
+    return rf'^posts/[0-9a-f]{{2}}/[0-9a-f]{{64}}\.{extension}$'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageIngestTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_ingest_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def save(self, image):
+        form = PostForm({'text': 'Text_ingest'}, {'image': image})
+        self.assertTrue(form.is_valid(), form.errors)
+        post = form.save(commit=False)
+        post.author = self.user
+        post.save()
+        form.save_m2m()
+        return post
+
+    def test_photo_downscaled_rotated_and_stripped(self):
+        """Фото уменьшается, поворачивается по EXIF и теряет метаданные."""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: повернуть на 90° по часовой
+        exif[0x010F] = 'Camera'  # Make
+        photo = upload(
+            'photo.jpg', Image.new('RGB', (3000, 1000), 'red'), 'JPEG',
+            exif=exif.tobytes(), quality=95,
+        )
+        post = self.save(photo)
+        self.assertRegex(post.image.name, hashed_name('webp'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (640, 1920))
+            self.assertFalse(image.getexif())
+            self.assertNotIn('exif', image.info)
+
+    @override_settings(POST_IMAGE_FORMAT='JPEG', POST_IMAGE_MAX_SIZE=100)
+    def test_jpeg_flattens_transparency(self):
+        """В JPEG прозрачность заменяется белым фоном."""
+        post = self.save(upload(
+            'logo.png', Image.new('RGBA', (200, 50), (0, 0, 0, 0)), 'PNG',
+        ))
+        self.assertRegex(post.image.name, hashed_name('jpg'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.mode, 'RGB')
+            self.assertEqual(image.size, (100, 25))
+            self.assertEqual(image.getpixel((0, 0)), (255, 255, 255))
+
+    def test_animation_kept(self):
+        """Анимированная картинка сохраняется как есть."""
+        frames = [Image.new('P', (10, 10), color) for color in (0, 1)]
+        buffer = BytesIO()
+        frames[0].save(
+            buffer, 'GIF', save_all=True, append_images=frames[1:]
+        )
+        post = self.save(SimpleUploadedFile('anim.gif', buffer.getvalue()))
+        self.assertRegex(post.image.name, hashed_name('gif'))
+
+    def test_truncated_image_rejected(self):
+        """Обрезанный файл отклоняется формой, а не ломает запрос."""
+        photo = upload('cut.jpg', Image.new('RGB', (800, 600), 'red'), 'JPEG')
+        data = photo.read()
+        form = PostForm({'text': 'Text_ingest'}, {
+            'image': SimpleUploadedFile('cut.jpg', data[:len(data) // 2]),
+        })
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'invalid_image')
+
+    @override_settings(POST_IMAGE_KEEP_ORIGINALS=True)
+    def test_original_kept_if_configured(self):
+        """Исходный файл сохраняется, только если это включено."""
+        self.save(upload('keep.png', Image.new('RGB', (10, 10)), 'PNG'))
+        self.assertTrue(os.path.exists(os.path.join(
+            TEMP_MEDIA_ROOT, settings.POST_IMAGE_ORIGINALS_DIR, 'keep.png'
+        )))
+
+    @override_settings(POST_IMAGE_KEEP_ORIGINALS=True)
+    def test_original_not_kept_for_unsaved_post(self):
+        """Исходник не пишется, пока пост не сохранён."""
+        form = PostForm({'text': 'Text_ingest'}, {
+            'image': upload('unsaved.png', Image.new('RGB', (10, 10)), 'PNG'),
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save(commit=False)
+        self.assertFalse(os.path.exists(os.path.join(
+            TEMP_MEDIA_ROOT, settings.POST_IMAGE_ORIGINALS_DIR, 'unsaved.png'
+        )))
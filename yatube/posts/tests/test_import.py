@@ -0,0 +1,153 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import timeline
+from ..counters import post_counters_drift, user_counters_drift
+from ..models import Comment, Follow, Post, TimelineEntry, User
+from ..search import search_posts
+
+RECORDS = [
+    {'type': 'user', 'username': 'test_import_leo', 'first_name': 'Лев'},
+    {'type': 'user', 'username': 'test_import_ann'},
+    {'type': 'group', 'slug': 'test_import_slug', 'title': 'Коты'},
+    {'type': 'follow', 'user': 'test_import_ann',
+     'author': 'test_import_leo'},
+    {'type': 'post', 'author': 'test_import_leo',
+     'group': 'test_import_slug', 'text': 'Пушистый кот',
+     'pub_date': '2021-05-01T10:00:00+03:00',
+     'comments': [{'author': 'test_import_ann', 'text': 'Класс',
+                   'created': '2021-05-02T10:00:00+03:00'}]},
+    {'type': 'post', 'author': 'test_import_nobody', 'text': 'Потерянный'},
+    {'type': 'post', 'author': 'test_import_ann', 'text': 'Второй пост'},
+]
+
+
+class ImportContentTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'content.ndjson')
+        self.write(RECORDS)
+        self.checkpoint = f'{self.path}.checkpoint'
+
+    def write(self, records, garbage=True):
+        with open(self.path, 'w', encoding='utf-8') as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            if garbage:
+                file.write('not json\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def import_content(self, **options):
+        out, err = StringIO(), StringIO()
+        call_command('import_content', self.path, batch_size=3,
+                     stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_import(self):
+        '''Импорт создаёт объекты и обновляет производные данные.'''
+        out, err = self.import_content()
+        self.assertIn('post: 2', out)
+        self.assertIn('skipped: 2', out)
+        self.assertIn("нет автора 'test_import_nobody'", err)
+        post = Post.objects.get(text='Пушистый кот')
+        self.assertEqual(post.author.first_name, 'Лев')
+        self.assertEqual(post.group.slug, 'test_import_slug')
+        self.assertEqual(
+            post.pub_date.isoformat(), '2021-05-01T07:00:00+00:00'
+        )
+        self.assertEqual(post.comments_count, 1)
+        comment = post.comments.get()
+        self.assertEqual(comment.author.username, 'test_import_ann')
+        self.assertEqual(
+            comment.created.isoformat(), '2021-05-02T07:00:00+00:00'
+        )
+        # Даты задаются без переключения auto_now_add у общего поля.
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
+        self.assertEqual(list(user_counters_drift()), [])
+        self.assertEqual(list(post_counters_drift()), [])
+        self.assertTrue(TimelineEntry.objects.filter(
+            user__username='test_import_ann', post=post,
+        ).exists())
+        self.assertEqual(
+            list(search_posts(Post.objects.all(), 'пушистый')), [post]
+        )
+
+    @override_settings(TIMELINE_BACKFILL=2)
+    def test_follows_backfill_recent_posts(self):
+        '''Подписки пачки дополняют ленты последними постами авторов.'''
+        authors = ['test_import_leo', 'test_import_ann']
+        users = authors + ['test_import_bob']
+        self.write(
+            [{'type': 'user', 'username': name} for name in users]
+            + [
+                {'type': 'post', 'author': author, 'text': f'{author} {day}',
+                 'pub_date': f'2021-05-0{day}T10:00:00+00:00'}
+                for author in authors for day in range(1, 4)
+            ]
+            + [
+                {'type': 'follow', 'user': 'test_import_bob',
+                 'author': author}
+                for author in authors
+            ]
+            + [{'type': 'follow', 'user': 'test_import_leo',
+                'author': 'test_import_ann'}],
+            garbage=False,
+        )
+        call_command('import_content', self.path, batch_size=100,
+                     stdout=StringIO(), stderr=StringIO())
+        entries = TimelineEntry.objects.select_related('user', 'post')
+        self.assertEqual(
+            {(entry.user.username, entry.post.text) for entry in entries},
+            {
+                ('test_import_bob', 'test_import_leo 3'),
+                ('test_import_bob', 'test_import_ann 3'),
+                ('test_import_bob', 'test_import_leo 2'),
+                ('test_import_bob', 'test_import_ann 2'),
+                ('test_import_leo', 'test_import_ann 3'),
+                ('test_import_leo', 'test_import_ann 2'),
+            },
+        )
+        self.assertTrue(all(
+            entry.pub_date == entry.post.pub_date for entry in entries
+        ))
+        # Популярные авторы, посты и вставка — по запросу на всю пачку.
+        pairs = list(Follow.objects.values_list('user_id', 'author_id'))
+        TimelineEntry.objects.all().delete()
+        with self.assertNumQueries(3):
+            timeline.backfill_many(pairs)
+        self.assertEqual(TimelineEntry.objects.count(), 6)
+
+    def test_resume_from_checkpoint(self):
+        '''Повторный запуск продолжает с контрольной точки без дублей.'''
+        self.import_content()
+        self.assertTrue(os.path.exists(self.checkpoint))
+        out, _ = self.import_content()
+        self.assertIn('post: 0', out)
+        # Сбой после записи пачки, но до сохранения контрольной точки:
+        # точка указывает на начало файла с теми же ключами.
+        with open(self.checkpoint, encoding='utf-8') as file:
+            state = json.load(file)
+        state.update(offset=0, line=0, post_pk=state['post_pk'] - 2,
+                     comment_pk=state['comment_pk'] - 1)
+        with open(self.checkpoint, 'w', encoding='utf-8') as file:
+            json.dump(state, file)
+        self.import_content()
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(list(user_counters_drift()), [])
+
+    def test_restart_ignores_checkpoint(self):
+        self.import_content()
+        Post.objects.all().delete()
+        out, _ = self.import_content(restart=True)
+        self.assertIn('post: 2', out)
@@ -0,0 +1,132 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import media, thumbnails
+from ..models import MediaFile, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00\x00'
+    b'\x21\xF9\x04\x01\x00\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x01\x00\x01\x00\x00\x02\x01\x00\x00\x3B'
+)
+
+
+def age(name, seconds=3600):
+    """Делает файл и отметку об освобождении старше на seconds."""
+    past = time.time() - seconds
+    os.utime(media.storage.path(name), (past, past))
+    MediaFile.objects.filter(name=name, references=0).update(
+        released=timezone.now() - timezone.timedelta(seconds=seconds)
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_media_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create(self, name='small.gif', content=GIF):
+        return Post.objects.create(
+            author=self.user, text='Text_media',
+            image=SimpleUploadedFile(name, content, 'image/gif'),
+        )
+
+    def test_same_bytes_stored_once(self):
+        '''Одинаковые байты хранятся одним файлом с двумя ссылками.'''
+        first, second = self.create('first.gif'), self.create('second.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(os.listdir(directory), [
+            os.path.basename(first.image.name)
+        ])
+        self.assertEqual(
+            MediaFile.objects.get(name=first.image.name).references, 2
+        )
+        # Миниатюры тоже общие: вторую картинку не нужно обрабатывать.
+        thumbnails.generate(first.image.name)
+        second.refresh_from_db()
+        self.assertIsNotNone(thumbnails.post_renditions(second))
+
+    def test_references_follow_posts(self):
+        '''Замена картинки и удаление поста снимают ссылку на файл.'''
+        post = self.create()
+        name = post.image.name
+        post.image = SimpleUploadedFile('other.gif', GIF + b'\x00')
+        post.save()
+        self.assertEqual(MediaFile.objects.get(name=name).references, 0)
+        self.assertIsNotNone(MediaFile.objects.get(name=name).released)
+        other = MediaFile.objects.get(name=post.image.name)
+        self.assertEqual(other.references, 1)
+        post.delete()
+        other.refresh_from_db()
+        self.assertEqual(other.references, 0)
+
+    def test_collect_removes_unreferenced(self):
+        '''Сборка мусора удаляет файл без ссылок вместе с миниатюрами.'''
+        post = self.create()
+        name = post.image.name
+        thumbnails.generate(name)
+        post.refresh_from_db()
+        renditions = json.loads(post.image_renditions)['renditions']
+        post.delete()
+        self.assertEqual(media.collect(grace=60), (0, 0))
+        age(name)
+        self.assertEqual(media.collect(grace=60), (1, len(GIF)))
+        self.assertFalse(media.storage.exists(name))
+        for *_, thumbnail in renditions:
+            self.assertFalse(default_storage.exists(thumbnail))
+        self.assertFalse(MediaFile.objects.filter(name=name).exists())
+
+    def test_collect_keeps_reuploaded(self):
+        '''Файл, который только что загрузили снова, не удаляется.'''
+        post = self.create()
+        name = post.image.name
+        post.delete()
+        age(name)
+        self.assertEqual(
+            media.storage.save('posts/again.gif', SimpleUploadedFile(
+                'again.gif', GIF
+            )),
+            name,
+        )
+        self.assertEqual(media.collect(grace=60), (0, 0))
+        self.assertTrue(media.storage.exists(name))
+
+    def test_collect_untracked_files(self):
+        '''Файлы без поста удаляются, исходники и файлы постов — нет.'''
+        post = self.create()
+        orphan = default_storage.save('posts/orphan.gif', StringIO('x'))
+        original = default_storage.save(
+            os.path.join(settings.POST_IMAGE_ORIGINALS_DIR, 'keep.gif'),
+            StringIO('x'),
+        )
+        for name in (post.image.name, orphan, original):
+            age(name)
+        out = StringIO()
+        call_command('collect_media', grace=60, dry_run=True, stdout=out)
+        self.assertIn('найдено: 1', out.getvalue())
+        self.assertTrue(default_storage.exists(orphan))
+        call_command('collect_media', grace=60, stdout=StringIO())
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertTrue(default_storage.exists(original))
+        self.assertTrue(media.storage.exists(post.image.name))
@@ -1,6 +1,9 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post, User
+from ..models import Comment, Follow, Group, Post, User, UserCounters
 
 
 class PostModelTest(TestCase):
@@ -30,3 +33,56 @@ class PostModelTest(TestCase):
         for model, result in str_post_group_models.items():
             with self.subTest(model=model):
                 self.assertEqual(model, result)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='test_counter_user',
+        )
+        cls.user_other = User.objects.create_user(
+            username='test_counter_user_other',
+        )
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(author=self.user, text='Test_counter')
+        comment = Comment.objects.create(
+            post=post, author=self.user_other, text='Test_comment'
+        )
+        follow = Follow.objects.create(user=self.user_other, author=self.user)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.user.counters.posts, 1)
+        self.assertEqual(self.user.counters.followers, 1)
+        self.assertEqual(self.user_other.counters.following, 1)
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        counters = UserCounters.objects.get(user=self.user)
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(counters.followers, 0)
+        post.delete()
+        counters.refresh_from_db()
+        self.assertEqual(counters.posts, 0)
+
+    def test_recount_counters_repairs_drift(self):
+        """recount_counters находит и исправляет расхождения."""
+        post = Post.objects.create(author=self.user, text='Test_counter')
+        Comment.objects.create(
+            post=post, author=self.user_other, text='Test_comment'
+        )
+        UserCounters.objects.filter(user=self.user).update(posts=5)
+        Post.objects.filter(pk=post.pk).update(comments_count=7)
+        out = StringIO()
+        call_command('recount_counters', '--dry-run', stdout=out)
+        self.assertIn('Расхождений найдено: 2', out.getvalue())
+        call_command('recount_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(UserCounters.objects.get(user=self.user).posts, 1)
+        out = StringIO()
+        call_command('recount_counters', '--dry-run', stdout=out)
+        self.assertIn('Расхождений найдено: 0', out.getvalue())
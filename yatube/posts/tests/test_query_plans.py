@@ -0,0 +1,129 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+# Полный проход по таблице без индекса или сортировка во временном B-дереве.
+# SQLite до 3.36 пишет «SCAN TABLE posts_post [AS U0]», новее — без TABLE;
+# проход по индексу («… USING INDEX …») допустим.
+BAD_PLAN = re.compile(r'^SCAN (TABLE )?\S+( AS \S+)?$|USE TEMP B-TREE')
+
+
+class QueryPlanTest(TestCase):
+    """Запросы всех представлений posts идут по индексам."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_plan_user')
+        cls.author = User.objects.create_user(username='test_plan_author')
+        cls.group = Group.objects.create(
+            title='test_plan_group',
+            slug='test_plan_slug',
+            description='Test description of test_plan_group',
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.author, text=f'Text_plan{i}', group=cls.group)
+            for i in range(15)
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Text_plan', group=cls.group,
+        )
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Comment{i}')
+            for i in range(25)
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def assertPlansUseIndexes(self, queries):
+        for query in queries:
+            sql = query['sql']
+            if sql.startswith(('SAVEPOINT', 'RELEASE', 'ROLLBACK')):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+            with self.subTest(sql=sql):
+                # Пустой план у чтения значит, что проверять было нечего.
+                if sql.startswith(('SELECT', 'UPDATE', 'DELETE')):
+                    self.assertTrue(plan)
+                self.assertFalse(
+                    [step for step in plan if BAD_PLAN.search(step)], plan
+                )
+
+    def check_get(self, url):
+        """Первая страница и страница по курсору для ленты."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url)
+            if response['Content-Type'] == 'application/json':
+                next_url = response.json()['next']
+            else:
+                paginator = getattr(response.context.get('page_obj'),
+                                    'paginator', None)
+                next_url = getattr(paginator, 'is_cursor', False) and (
+                    f'{url}?{paginator.next_query}'
+                )
+            if next_url:
+                self.authorized_client.get(next_url)
+        self.assertPlansUseIndexes(queries)
+
+    def test_read_views(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+            reverse('posts:follow_index'),
+            reverse('posts:search') + '?q=Text_plan',
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=(self.group.slug,)),
+            reverse('posts:api_profile', args=(self.author.username,)),
+            reverse('posts:api_follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.check_get(url)
+
+    def test_post_comments_view(self):
+        url = reverse('posts:post_comments', args=(self.post.pk,))
+        with CaptureQueriesContext(connection) as queries:
+            next_url = self.authorized_client.get(url).json()['next']
+            self.authorized_client.get(next_url)
+        self.assertPlansUseIndexes(queries)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_follow_index_with_celebrities(self):
+        self.check_get(reverse('posts:follow_index'))
+
+    def test_write_views(self):
+        author_client = Client()
+        author_client.force_login(self.author)
+        with CaptureQueriesContext(connection) as queries:
+            author_client.post(
+                reverse('posts:post_create'), data={'text': 'Text_new'}
+            )
+            author_client.post(
+                reverse('posts:post_edit', args=(self.post.pk,)),
+                data={'text': 'Text_edited'},
+            )
+            self.authorized_client.post(
+                reverse('posts:add_comment', args=(self.post.pk,)),
+                data={'text': 'Comment_new'},
+            )
+            self.authorized_client.get(
+                reverse('posts:profile_unfollow', args=(self.author,))
+            )
+            self.authorized_client.get(
+                reverse('posts:profile_follow', args=(self.author,))
+            )
+        self.assertPlansUseIndexes(queries)
@@ -0,0 +1,94 @@
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.db_router import PRIMARY, REPLICA
+
+from ..models import Group, Post, User
+
+
+# Реплика в тестах — зеркало основной базы, а TestCase держит данные
+# в незафиксированной транзакции, которую второе соединение не видит.
+@override_settings(READ_REPLICA_ENABLED=True)
+class ReplicaRouterTest(TransactionTestCase):
+    databases = {PRIMARY, REPLICA}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='test_replica_user')
+        self.group = Group.objects.create(
+            title='Test_replica_group', slug='test_replica_slug',
+            description='Test_replica_description',
+        )
+        self.post = Post.objects.create(
+            author=self.user, group=self.group, text='Text_replica'
+        )
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def get(self, url):
+        with CaptureQueriesContext(connections[PRIMARY]) as primary, \
+                CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return primary, replica
+
+    def posts_queries(self, queries):
+        return [
+            query['sql'] for query in queries
+            if '"posts_post"' in query['sql']
+        ]
+
+    def test_read_only_views_read_replica(self):
+        '''Страницы только на чтение читают посты из реплики.'''
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user.username,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                primary, replica = self.get(url)
+                self.assertTrue(self.posts_queries(replica))
+                self.assertFalse(self.posts_queries(primary))
+
+    def test_session_and_user_read_primary(self):
+        '''Сессия и пользователь запроса читаются из основной базы.'''
+        primary, replica = self.get(reverse('posts:index'))
+        tables = ' '.join(query['sql'] for query in replica)
+        self.assertNotIn('django_session', tables)
+        self.assertIn(
+            'django_session', ' '.join(query['sql'] for query in primary)
+        )
+
+    def test_writes_go_to_primary(self):
+        '''Запись и чтение в представлениях записи идут в основную базу.'''
+        with CaptureQueriesContext(connections[REPLICA]) as replica:
+            self.client.post(
+                reverse('posts:post_create'), {'text': 'Text_replica_new'}
+            )
+        self.assertFalse(replica.captured_queries)
+        self.assertTrue(Post.objects.filter(text='Text_replica_new').exists())
+
+    def test_author_reads_primary_after_write(self):
+        '''После записи автор некоторое время читает из основной базы.'''
+        self.client.post(
+            reverse('posts:post_create'), {'text': 'Text_replica_new'}
+        )
+        primary, replica = self.get(reverse('posts:index'))
+        self.assertFalse(replica.captured_queries)
+        self.assertTrue(self.posts_queries(primary))
+        other = Client()
+        with CaptureQueriesContext(connections[REPLICA]) as replica:
+            other.get(reverse('posts:index'))
+        self.assertTrue(self.posts_queries(replica))
+
+    @override_settings(READ_REPLICA_ENABLED=False)
+    def test_disabled_replica_not_used(self):
+        '''Без реплики всё читается из основной базы.'''
+        _, replica = self.get(reverse('posts:index'))
+        self.assertFalse(replica.captured_queries)
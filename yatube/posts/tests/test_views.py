@@ -1,16 +1,32 @@
+from array import array
+from http import HTTPStatus
+from io import BytesIO, StringIO
 import tempfile
 import shutil
+from unittest import mock
 
 from django import forms
 from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
 from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.core.paginator import Page
-from django.test import TestCase, Client, override_settings
+from django.db import connection, transaction
+from django.test import (
+    TestCase, TransactionTestCase, Client, RequestFactory, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from PIL import Image
+
+from core.cache import bump_cache_version, get_cache_version, page_cache_key
 
 from ..forms import PostForm, CommentForm
-from ..models import Comment, Group, Follow, Post, User
+from .. import following, thumbnails
+from ..models import Comment, Group, Follow, Post, TimelineEntry, User
+from ..utils import encode_cursor
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -237,6 +253,41 @@ class PaginatorViewsTest(TestCase):
             self.NUMBER_POSTS_PAGE_2,
         )
 
+    def test_cursor_paginator_next_previous(self):
+        '''Переход по курсорам вперёд и назад без пропусков и повторов.'''
+        response = self.guest_client_other.get(self.reverse_group)
+        page_1 = response.context['page_obj']
+        self.assertTrue(page_1.has_next())
+        self.assertFalse(page_1.has_previous())
+        response = self.guest_client_other.get(
+            f'{self.reverse_group}?{page_1.paginator.next_query}'
+        )
+        page_2 = response.context['page_obj']
+        self.assertEqual(len(page_2), self.NUMBER_POSTS_PAGE_2)
+        self.assertFalse(page_2.has_next())
+        self.assertFalse(set(page_1) & set(page_2))
+        response = self.guest_client_other.get(
+            f'{self.reverse_group}?{page_2.paginator.previous_query}'
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), list(page_1)
+        )
+
+    def test_cursor_paginator_bad_token(self):
+        '''Повреждённый курсор открывает первую страницу.'''
+        response = self.guest_client_other.get(
+            self.reverse_profile + '?after=broken'
+        )
+        self.assertEqual(response.context['page_obj'].number, 1)
+
+    def test_cursor_paginator_no_count_query(self):
+        '''Курсорная страница не выполняет COUNT(*).'''
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client_other.get(self.reverse_group + '?page=2')
+        self.assertFalse(
+            [q for q in queries if 'COUNT(' in q['sql'].upper()]
+        )
+
 
 class CachePageTests(TestCase):
     @classmethod
@@ -258,19 +309,268 @@ class CachePageTests(TestCase):
 
     def test_index_page_have_cache(self):
         '''Проверка работы кеша на главной странице.'''
-        content_before = self.authorized_client.get(self.reverse_index).content
-        Post.objects.create(
+        post = Post.objects.create(
             author=self.user,
             text='Text_page',
             group=self.group,
         )
-        content_with_new_post = self.authorized_client.get(
+        content_before = self.authorized_client.get(self.reverse_index).content
+        Post.objects.filter(pk=post.pk).update(text='Text_page_updated')
+        content_cached = self.authorized_client.get(
             self.reverse_index).content
-        self.assertEqual(content_with_new_post, content_before)
+        self.assertEqual(content_cached, content_before)
         cache.clear()
         content_clear_cache = self.authorized_client.get(
             self.reverse_index).content
-        self.assertNotEqual(content_with_new_post, content_clear_cache)
+        self.assertNotEqual(content_cached, content_clear_cache)
+
+    def test_index_page_cache_invalidated_on_write(self):
+        '''Новый пост и изменение группы сразу сбрасывают кеш главной.'''
+        content_before = self.authorized_client.get(self.reverse_index).content
+        Post.objects.create(
+            author=self.user,
+            text='Text_page_new',
+            group=self.group,
+        )
+        content_with_new_post = self.authorized_client.get(
+            self.reverse_index).content
+        self.assertNotEqual(content_with_new_post, content_before)
+        self.group.title = 'test_page_group_renamed'
+        self.group.save()
+        self.assertIn(
+            self.group.title.encode(),
+            self.authorized_client.get(self.reverse_index).content,
+        )
+
+    def test_index_page_bypass_cache_for_author(self):
+        '''Автор после публикации видит главную в обход кеша.'''
+        self.authorized_client.force_login(self.user)
+        self.authorized_client.post(
+            reverse('posts:post_create'), data={'text': 'Text_author'}
+        )
+        self.authorized_client.get(self.reverse_index)
+        # bulk_create не шлёт сигналов и не меняет поколение кеша
+        Post.objects.bulk_create(
+            [Post(author=self.user, text='Text_author_bulk')]
+        )
+        content = self.authorized_client.get(self.reverse_index).content
+        self.assertIn(b'Text_author_bulk', content)
+
+    def update_text(self, post, text):
+        """Меняет текст в обход сигналов: состояние страницы то же,
+        а карточка поста перестраивается."""
+        Post.objects.filter(pk=post.pk).update(text=text)
+        bump_cache_version(f'post:{post.pk}')
+
+    def lock_page(self, url, user=None):
+        """Блокировка перестроения, как будто страницу строит другой запрос."""
+        request = RequestFactory().get(url)
+        request.user = user or AnonymousUser()
+        cache.add(f'{page_cache_key("index", request)}:lock', 1)
+
+    def test_stale_page_while_regenerating(self):
+        '''Пока страницу перестраивает другой запрос, отдаётся старая.'''
+        cache.clear()
+        Post.objects.create(author=self.user, text='Text_page_old')
+        self.guest_client.get(self.reverse_index)
+        # bulk_create не меняет поколение, но меняет дату новейшего поста.
+        Post.objects.bulk_create(
+            [Post(author=self.user, text='Text_page_fresh')]
+        )
+        self.lock_page(self.reverse_index)
+        content = self.guest_client.get(self.reverse_index).content
+        self.assertIn(b'Text_page_old', content)
+        self.assertNotIn(b'Text_page_fresh', content)
+        cache.clear()
+        self.assertIn(
+            b'Text_page_fresh',
+            self.guest_client.get(self.reverse_index).content,
+        )
+
+    def test_stale_page_has_own_validators(self):
+        '''Устаревшая копия не получает ETag текущего состояния.'''
+        cache.clear()
+        Post.objects.create(author=self.user, text='Text_etag_old')
+        fresh = self.guest_client.get(self.reverse_index)
+        Post.objects.bulk_create(
+            [Post(author=self.user, text='Text_etag_fresh')]
+        )
+        self.lock_page(self.reverse_index)
+        stale = self.guest_client.get(self.reverse_index)
+        self.assertIn(b'Text_etag_old', stale.content)
+        self.assertEqual(stale['ETag'], fresh['ETag'])
+        self.assertIn('no-cache', stale['Cache-Control'])
+        cache.clear()
+        response = self.guest_client.get(
+            self.reverse_index, HTTP_IF_NONE_MATCH=stale['ETag']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn(b'Text_etag_fresh', response.content)
+
+    @override_settings(PAGE_CACHE_WAIT=0.1)
+    def test_cold_page_rendered_after_wait(self):
+        '''Без копии запрос недолго ждёт чужого перестроения.'''
+        cache.clear()
+        Post.objects.create(author=self.user, text='Text_page_cold')
+        self.lock_page(self.reverse_index)
+        response = self.guest_client.get(self.reverse_index)
+        self.assertIn(b'Text_page_cold', response.content)
+
+    def test_early_expiry(self):
+        '''Копия может обновиться раньше срока (XFetch).'''
+        cache.clear()
+        post = Post.objects.create(author=self.user, text='Text_page')
+        self.guest_client.get(self.reverse_index)
+        self.update_text(post, 'Text_page_updated')
+        with mock.patch('core.cache.random.random', return_value=0.5):
+            with override_settings(PAGE_CACHE_BETA=0):
+                content = self.guest_client.get(self.reverse_index).content
+            self.assertNotIn(b'Text_page_updated', content)
+            with override_settings(PAGE_CACHE_BETA=10 ** 9):
+                content = self.guest_client.get(self.reverse_index).content
+            self.assertIn(b'Text_page_updated', content)
+
+    def test_group_and_profile_cached_per_user(self):
+        '''Группа и профиль кешируются отдельно для каждого пользователя.'''
+        cache.clear()
+        post = Post.objects.create(
+            author=self.user, text='Text_page', group=self.group
+        )
+        reader = User.objects.create_user(username='test_page_reader')
+        self.authorized_client.force_login(reader)
+        urls = (
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user.username,)),
+        )
+        for url in urls:
+            self.guest_client.get(url)
+        self.update_text(post, 'Text_page_updated')
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotIn(
+                    b'Text_page_updated', self.guest_client.get(url).content
+                )
+                content = self.authorized_client.get(url).content
+                self.assertIn(b'Text_page_updated', content)
+                self.assertIn(b'test_page_reader', content)
+
+
+class CacheCommitTests(TransactionTestCase):
+    def test_index_generation_bumped_after_commit(self):
+        '''Поколение ленты меняется ещё раз после коммита транзакции.'''
+        user = User.objects.create_user(username='test_commit_user')
+        with transaction.atomic():
+            Post.objects.create(author=user, text='Text_commit')
+            # Копия, сохранённая до коммита, попадёт в это поколение.
+            before_commit = get_cache_version('index_page')
+        self.assertNotEqual(get_cache_version('index_page'), before_commit)
+
+    def test_card_generations_bumped_after_commit(self):
+        '''Поколения карточек меняются ещё раз после коммита.'''
+        user = User.objects.create_user(username='test_commit_user')
+        post = Post.objects.create(author=user, text='Text_commit')
+        names = (f'post:{post.pk}', f'user:{user.pk}')
+        with transaction.atomic():
+            post.save()
+            user.first_name = 'Пётр'
+            user.save()
+            before_commit = [get_cache_version(name) for name in names]
+        self.assertNotEqual(
+            [get_cache_version(name) for name in names], before_commit
+        )
+
+
+class CommentPaginationTests(TestCase):
+    NUMBER_COMMENTS_PAGE_2: int = 2
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='test_comment_user',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Text_comment_page',
+        )
+        cls.post_other = Post.objects.create(
+            author=cls.user,
+            text='Text_comment_page_other',
+        )
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'comment{i}')
+            for i in range(
+                settings.NUMBER_OF_COMMENTS + cls.NUMBER_COMMENTS_PAGE_2
+            )
+        )
+        Comment.objects.create(
+            post=cls.post_other, author=cls.user, text='other_comment'
+        )
+        cls.reverse_post_detail = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk}
+        )
+        cls.reverse_post_comments = reverse(
+            'posts:post_comments', kwargs={'post_id': cls.post.pk}
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_post_detail_shows_only_post_comments(self):
+        '''На странице поста только его комментарии, первая порция.'''
+        response = self.guest_client.get(self.reverse_post_detail)
+        comment_post = response.context['comment_post']
+        self.assertEqual(len(comment_post), settings.NUMBER_OF_COMMENTS)
+        self.assertTrue(comment_post.has_next())
+        for comment in comment_post:
+            self.assertEqual(comment.post_id, self.post.pk)
+
+    def test_post_comments_load_more(self):
+        '''JSON-эндпоинт отдаёт следующую порцию комментариев.'''
+        response = self.guest_client.get(self.reverse_post_detail)
+        next_query = response.context['comment_post'].paginator.next_query
+        data = self.guest_client.get(
+            f'{self.reverse_post_comments}?{next_query}'
+        ).json()
+        self.assertEqual(
+            len(data['comments']), self.NUMBER_COMMENTS_PAGE_2
+        )
+        self.assertIsNone(data['next'])
+        self.assertNotIn(
+            'other_comment', [c['text'] for c in data['comments']]
+        )
+
+    @override_settings(PAGINATION_MODE='page')
+    def test_load_more_in_page_mode(self):
+        '''«Показать ещё» ведёт на курсор и в постраничном режиме.'''
+        response = self.guest_client.get(self.reverse_post_detail)
+        next_query = response.context['comment_post'].paginator.next_query
+        self.assertTrue(next_query.startswith('after='))
+        self.assertContains(
+            response, f'data-url="{self.reverse_post_comments}?{next_query}"'
+        )
+
+    def test_post_comments_after_last(self):
+        '''За последним комментарием пусто, а не снова первая порция.'''
+        last = self.post.comments.order_by('created', 'pk').last()
+        cursor = encode_cursor(last.created, last.pk, 2)
+        last.delete()
+        for name in ('after', 'before'):
+            with self.subTest(name=name):
+                if name == 'before':
+                    first = self.post.comments.order_by('created', 'pk')[0]
+                    cursor = encode_cursor(first.created, first.pk, 2)
+                data = self.guest_client.get(
+                    self.reverse_post_comments, {name: cursor}
+                ).json()
+                self.assertEqual(data, {'comments': [], 'next': None})
+
+    def test_post_comments_unknown_post(self):
+        '''Комментарии несуществующего поста — 404.'''
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
 
 
 class FollowTests(TestCase):
@@ -363,3 +663,556 @@ class FollowTests(TestCase):
             self.reverse_index_follow
         )
         self.assertNotIn(new_post_other, response.context['page_obj'])
+
+    def test_followed_ids_cached(self):
+        '''Подписки пользователя читаются из кеша отсортированным массивом.'''
+        cache.clear()
+        with self.assertNumQueries(1):
+            following.followed_ids(self.user_follower.pk)
+        with self.assertNumQueries(0):
+            ids = following.followed_ids(self.user_follower.pk)
+        self.assertEqual(ids, array('q', [self.user_following.pk]))
+
+    def test_follow_updates_cached_ids(self):
+        '''Подписка и отписка сразу меняют массив в кеше.'''
+        follower, author = self.user_follower.pk, self.user_following.pk
+        following.followed_ids(follower)
+        self.authorized_client_follower.get(self.reverse_profile_unfollow)
+        self.assertFalse(following.is_following(follower, author))
+        self.authorized_client_follower.get(self.reverse_profile_follow)
+        self.assertTrue(following.is_following(follower, author))
+
+    def test_profile_checks_follow_without_follow_table(self):
+        '''Профиль проверяет подписку без запроса к таблице подписок.'''
+        cache.clear()
+        following.followed_ids(self.user_follower.pk)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client_follower.get(reverse(
+                'posts:profile', args=(self.user_following.username,)
+            ))
+        self.assertTrue(response.context['following'])
+        self.assertFalse([
+            query['sql'] for query in queries
+            if '"posts_follow"' in query['sql']
+        ])
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_follower = User.objects.create_user(
+            username='test_timeline_follower',
+        )
+        cls.user_following = User.objects.create_user(
+            username='test_timeline_following',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user_following,
+            text='Text_timeline_old',
+        )
+        cls.reverse_index_follow = reverse('posts:follow_index')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client_follower = Client()
+        self.authorized_client_follower.force_login(self.user_follower)
+
+    def test_follow_backfills_and_unfollow_trims_timeline(self):
+        '''Подписка дополняет ленту старыми постами, отписка чистит её.'''
+        follow = Follow.objects.create(
+            user=self.user_follower,
+            author=self.user_following,
+        )
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user_follower, post=self.post,
+        ).exists())
+        follow.delete()
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user_follower).exists()
+        )
+
+    def test_new_post_fanned_out_to_followers(self):
+        '''Новый пост раскладывается в ленты подписчиков.'''
+        Follow.objects.create(
+            user=self.user_follower,
+            author=self.user_following,
+        )
+        new_post = Post.objects.create(
+            author=self.user_following,
+            text='Text_timeline_new',
+        )
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user_follower, post=new_post,
+        ).exists())
+        response = self.authorized_client_follower.get(
+            self.reverse_index_follow
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), [new_post, self.post]
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_posts_read_on_request(self):
+        '''Посты популярного автора не раскладываются, но видны в ленте.'''
+        Follow.objects.create(
+            user=self.user_follower,
+            author=self.user_following,
+        )
+        new_post = Post.objects.create(
+            author=self.user_following,
+            text='Text_timeline_celebrity',
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user_follower).exists()
+        )
+        response = self.authorized_client_follower.get(
+            self.reverse_index_follow
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), [new_post, self.post]
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_posts_merged_without_writes(self):
+        '''Посты популярного автора подмешиваются в ленту без записи.'''
+        Follow.objects.create(
+            user=self.user_follower,
+            author=self.user_following,
+        )
+        for url in (self.reverse_index_follow,
+                    reverse('posts:api_follow_index')):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_client_follower.get(url)
+                self.assertContains(response, 'Text_timeline_old')
+                self.assertFalse([
+                    query for query in queries
+                    if query['sql'].startswith(('INSERT', 'UPDATE'))
+                ])
+        self.assertFalse(TimelineEntry.objects.exists())
+        # Новый пост меняет ETag, хотя в ленту не записан.
+        Post.objects.create(
+            author=self.user_following,
+            text='Text_timeline_celebrity',
+        )
+        response = self.authorized_client_follower.get(
+            reverse('posts:api_follow_index'),
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    @override_settings(NUMBER_OF_POST=3, TIMELINE_FANOUT_LIMIT=1)
+    def test_merged_timeline_pages(self):
+        '''Страницы ленты с популярным автором идут по порядку без
+        повторов и пропусков.'''
+        other = User.objects.create_user(username='test_timeline_other')
+        fan = User.objects.create_user(username='test_timeline_fan')
+        Follow.objects.bulk_create([
+            Follow(user=self.user_follower, author=self.user_following),
+            Follow(user=fan, author=self.user_following),
+            Follow(user=self.user_follower, author=other),
+        ])
+        call_command('recount_counters', stdout=StringIO())
+        following.forget(self.user_follower.pk)
+        for i in range(4):
+            Post.objects.create(author=other, text=f'Text_other{i}')
+            Post.objects.create(
+                author=self.user_following, text=f'Text_celebrity{i}'
+            )
+        self.assertFalse(TimelineEntry.objects.filter(
+            author=self.user_following
+        ).exists())
+        expected = list(Post.objects.filter(
+            author__in=(other, self.user_following)
+        ).order_by('-pub_date', '-pk'))
+        url = self.reverse_index_follow
+        seen = []
+        while url:
+            page_obj = self.authorized_client_follower.get(
+                url
+            ).context['page_obj']
+            seen.extend(page_obj)
+            url = page_obj.has_next() and (
+                f'{self.reverse_index_follow}?'
+                f'{page_obj.paginator.next_query}'
+            )
+        self.assertEqual(len(expected), 9)
+        self.assertEqual(seen, expected)
+        with self.settings(PAGINATION_MODE='page'):
+            page_obj = self.authorized_client_follower.get(
+                self.reverse_index_follow, {'page': 3}
+            ).context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 9)
+        self.assertEqual(list(page_obj), expected[6:])
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_search_user')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Весенний дождь над рекой',
+        )
+        cls.post_other = Post.objects.create(
+            author=cls.user,
+            text='Осенний дождь и дождь снова',
+        )
+        cls.reverse_search = reverse('posts:search')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query):
+        response = self.guest_client.get(self.reverse_search, {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_ranked_results(self):
+        '''Поиск находит посты по словам и ранжирует их.'''
+        self.assertEqual(self.search('дождь'), [self.post_other, self.post])
+        self.assertEqual(self.search('ВЕСЕН'), [self.post])
+        self.assertEqual(self.search('"зима'), [])
+
+    def test_search_index_follows_post_changes(self):
+        '''Индекс обновляется при изменении и удалении поста.'''
+        post = Post.objects.create(author=self.user, text='Снег')
+        self.assertEqual(self.search('снег'), [post])
+        post.text = 'Гроза'
+        post.save()
+        self.assertEqual(self.search('снег'), [])
+        self.assertEqual(self.search('гроза'), [post])
+        post.delete()
+        self.assertEqual(self.search('гроза'), [])
+
+    def test_rebuild_search_index(self):
+        '''Команда rebuild_search_index индексирует существующие посты.'''
+        Post.objects.bulk_create([Post(author=self.user, text='Туман')])
+        self.assertEqual(self.search('туман'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('туман')), 1)
+
+    def test_admin_search_uses_index(self):
+        '''Поиск в админке идёт через полнотекстовый индекс.'''
+        admin = User.objects.create_superuser(
+            username='test_search_admin', email='', password='pass',
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'весенний'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].queryset), [self.post]
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(THUMBNAIL_BACKGROUND=True)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_thumb_user')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Text_thumb',
+            image=SimpleUploadedFile(
+                name='test_thumb.gif',
+                content=(
+                    b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00\x00'
+                    b'\x21\xF9\x04\x01\x00\x00\x00\x00\x2C\x00\x00\x00\x00'
+                    b'\x01\x00\x01\x00\x00\x02\x01\x00\x00\x3B'
+                ),
+                content_type='image/gif',
+            ),
+        )
+        cls.reverse_post_detail = reverse(
+            'posts:post_detail', args=(cls.post.pk,)
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_placeholder_until_thumbnail_ready(self):
+        '''Пока миниатюры нет, страница показывает заглушку.'''
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            response = self.guest_client.get(self.reverse_post_detail)
+            self.assertContains(response, 'aspect-ratio: 960 / 339')
+            self.guest_client.get(reverse('posts:api_index'))
+        # Чтение страниц ничего не ставит в очередь.
+        schedule.assert_not_called()
+
+        thumbnails.generate(self.post.image.name)
+        post = Post.objects.get(pk=self.post.pk)
+        thumbnail = thumbnails.post_thumbnail(post)
+        self.assertIsNotNone(thumbnail)
+        response = self.guest_client.get(self.reverse_post_detail)
+        self.assertContains(response, thumbnail)
+        self.assertNotContains(response, 'aspect-ratio: 960 / 339')
+
+    @override_settings(THUMBNAIL_BACKGROUND=False)
+    def test_thumbnail_created_on_save(self):
+        '''Без фонового режима миниатюра создаётся при сохранении поста.'''
+        post = Post.objects.create(
+            author=self.user, text='Text_thumb_sync', image=self.post.image,
+        )
+        post.refresh_from_db()
+        self.assertIsNotNone(thumbnails.post_thumbnail(post))
+
+    def test_generate_thumbnails_command(self):
+        '''Команда ставит в очередь картинки постов без версий.'''
+        with mock.patch.object(thumbnails.generate, 'enqueue') as enqueue:
+            call_command('generate_thumbnails', stdout=StringIO())
+        enqueue.assert_called_once_with(self.post.image.name)
+        thumbnails.generate(self.post.image.name)
+        out = StringIO()
+        call_command('generate_thumbnails', stdout=out)
+        self.assertIn('Картинок в очереди: 0', out.getvalue())
+
+    def test_background_requires_shared_cache(self):
+        '''Фоновые миниатюры с кешем в памяти процесса не запускаются.'''
+        with self.assertRaises(ImproperlyConfigured):
+            thumbnails.check_settings()
+        shared = {
+            'default': {
+                'BACKEND': 'core.cache_backends.TwoTierCache',
+                'OPTIONS': {'SHARED': 'shared'},
+            },
+            'shared': {
+                'BACKEND': 'django.core.cache.backends.filebased.'
+                           'FileBasedCache',
+                'LOCATION': TEMP_MEDIA_ROOT,
+            },
+        }
+        with self.settings(CACHES=shared):
+            thumbnails.check_settings()
+        with self.settings(THUMBNAIL_BACKGROUND=False):
+            thumbnails.check_settings()
+
+    def photo(self, name, width, color='red'):
+        buffer = BytesIO()
+        Image.new('RGB', (width, width // 2), color).save(buffer, 'JPEG')
+        return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+    def test_renditions_in_srcset(self):
+        '''Версии картинки не шире исходной попадают в srcset карточки.'''
+        post = Post.objects.create(
+            author=self.user, text='Text_renditions',
+            image=self.photo('test_renditions.jpg', 1200),
+        )
+        thumbnails.generate(post.image.name)
+        post.refresh_from_db()
+        renditions = thumbnails.post_renditions(post)
+        self.assertEqual(
+            [(width, height) for width, height, _ in renditions],
+            [(320, 113), (640, 226), (960, 339)],
+        )
+        response = self.guest_client.get(reverse('posts:index'))
+        srcset = ', '.join(f'{url} {width}w' for width, _, url in renditions)
+        self.assertContains(response, f'srcset="{srcset}"')
+        self.assertContains(response, 'loading="lazy"')
+        response = self.guest_client.get(
+            reverse('posts:post_detail', args=(post.pk,))
+        )
+        self.assertContains(response, f'srcset="{srcset}"')
+        # Картинка поста вверху страницы грузится сразу.
+        self.assertNotContains(response, 'loading="lazy"')
+
+    def test_renditions_of_replaced_image_ignored(self):
+        '''Версии прежней картинки не используются после её замены.'''
+        post = Post.objects.create(
+            author=self.user, text='Text_replaced',
+            image=self.photo('test_replaced.jpg', 640),
+        )
+        thumbnails.generate(post.image.name)
+        post.refresh_from_db()
+        self.assertIsNotNone(thumbnails.post_renditions(post))
+        post.image = self.photo('test_replacement.jpg', 640, 'blue')
+        post.save()
+        self.assertIsNone(thumbnails.post_renditions(post))
+        thumbnails.generate(post.image.name)
+        post.refresh_from_db()
+        self.assertEqual(
+            [width for width, _, _ in thumbnails.post_renditions(post)],
+            [320, 640, 960],
+        )
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='test_card_user', first_name='Иван',
+        )
+        cls.group = Group.objects.create(
+            title='test_card_group',
+            slug='test_card_slug',
+            description='Test description of test_card_group',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Text_card', group=cls.group,
+        )
+        cls.reverse_group = reverse('posts:group_list', args=(cls.group.slug,))
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def get_group_page(self):
+        return self.guest_client.get(self.reverse_group).content.decode()
+
+    def test_card_is_cached(self):
+        '''Карточка поста берётся из кеша, пока пост не изменился.'''
+        self.assertIn('Text_card', self.get_group_page())
+        Post.objects.filter(pk=self.post.pk).update(text='Text_card_new')
+        self.assertNotIn('Text_card_new', self.get_group_page())
+        self.post.text = 'Text_card_new'
+        self.post.save()
+        self.assertIn('Text_card_new', self.get_group_page())
+
+    def test_card_follows_author_and_group(self):
+        '''Карточка обновляется при смене имени автора и группы.'''
+        self.get_group_page()
+        self.user.first_name = 'Пётр'
+        self.user.save()
+        self.assertIn('Пётр', self.get_group_page())
+        self.group.title = 'test_card_group_new'
+        self.group.save()
+        self.assertIn('все записи группы test_card_group_new',
+                      self.get_group_page())
+
+    def test_card_not_invalidated_by_login(self):
+        '''Вход автора не сбрасывает кеш карточек.'''
+        self.get_group_page()
+        Post.objects.filter(pk=self.post.pk).update(text='Text_card_new')
+        Client().force_login(self.user)
+        self.assertNotIn('Text_card_new', self.get_group_page())
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_cond_user')
+        cls.author = User.objects.create_user(username='test_cond_author')
+        cls.group = Group.objects.create(
+            title='test_cond_group',
+            slug='test_cond_slug',
+            description='Test description of test_cond_group',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Text_cond', group=cls.group,
+        )
+        cls.reverse_profile = reverse(
+            'posts:profile', args=(cls.author.username,)
+        )
+        cls.reverse_post_detail = reverse(
+            'posts:post_detail', args=(cls.post.pk,)
+        )
+        cls.pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(cls.group.slug,)),
+            cls.reverse_profile,
+            cls.reverse_post_detail,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def revalidate(self, url, etag):
+        return self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_page_is_not_modified(self):
+        '''Неизменившаяся страница — 304 без выборки постов.'''
+        for url in self.pages:
+            with self.subTest(url=url):
+                # Первый ответ выставляет CSRF-cookie, она входит в ETag.
+                self.authorized_client.get(url)
+                etag = self.authorized_client.get(url)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.revalidate(url, etag)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+                self.assertFalse([
+                    query for query in queries
+                    if '"posts_post"."text"' in query['sql']
+                ])
+
+    def test_last_modified_for_feeds(self):
+        '''Ленты отдают Last-Modified, страница поста — только ETag.'''
+        for url in self.pages[:3]:
+            with self.subTest(url=url):
+                self.assertIn('Last-Modified',
+                              self.authorized_client.get(url))
+        self.assertNotIn(
+            'Last-Modified',
+            self.authorized_client.get(self.reverse_post_detail),
+        )
+
+    def test_changes_invalidate_etag(self):
+        '''Комментарий, правка и подписка дают новую страницу.'''
+        changes = (
+            (self.reverse_post_detail, lambda: Comment.objects.create(
+                post=self.post, author=self.user, text='Comment_cond',
+            )),
+            (self.reverse_post_detail, lambda: Post.objects.filter(
+                pk=self.post.pk
+            ).first().save()),
+            (self.reverse_profile, lambda: Follow.objects.create(
+                user=self.user, author=self.author,
+            )),
+        )
+        for url, change in changes:
+            with self.subTest(url=url):
+                self.authorized_client.get(url)
+                etag = self.authorized_client.get(url)['ETag']
+                self.assertEqual(self.revalidate(url, etag).status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                change()
+                self.assertEqual(
+                    self.revalidate(url, etag).status_code, HTTPStatus.OK
+                )
+
+    def test_etag_depends_on_user(self):
+        '''Страница другого пользователя не считается той же.'''
+        etag = self.authorized_client.get(self.reverse_profile)['ETag']
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(self.reverse_profile, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_comment_replaced_invalidates_etag(self):
+        '''Новый комментарий вместо удалённого — новая страница поста.'''
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='Comment_cond_old',
+        )
+        url = self.reverse_post_detail
+        self.authorized_client.get(url)
+        etag = self.authorized_client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Comment_cond_new',
+        )
+        comment.delete()
+        self.assertEqual(self.revalidate(url, etag).status_code, HTTPStatus.OK)
+
+    def test_follow_state_in_profile_etag(self):
+        '''Кнопка подписки меняет ETag, даже если счётчики те же.'''
+        url = self.reverse_profile
+        self.authorized_client.get(url)
+        etag = self.authorized_client.get(url)['ETag']
+        # Без сигналов: счётчики подписчиков не меняются.
+        Follow.objects.bulk_create(
+            [Follow(user=self.user, author=self.author)]
+        )
+        following.refresh(self.user.pk)
+        self.assertEqual(self.revalidate(url, etag).status_code, HTTPStatus.OK)
@@ -0,0 +1,139 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+Шаблоны и API не обрабатывают картинки и ничего не ставят в очередь во
+время запроса: они читают готовые версии из Post.image_renditions, а
+пока их нет, показывают заглушку. Генерация ставится в очередь
+thumbnails (core.jobs, команда runworker) при сохранении поста
+(signals.post_thumbnails), для старых постов — командой
+generate_thumbnails.
+
+Кроме основной миниатюры GEOMETRY создаются версии шириной
+POST_IMAGE_RENDITIONS (не шире исходной картинки) с тем же
+соотношением сторон.
+"""
+import json
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from core.cache import bump_cache_version, is_shared_cache
+from core.jobs import job
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+storage = Post._meta.get_field('image').storage
+
+WIDTH, HEIGHT = 960, 339
+GEOMETRY = f'{WIDTH}x{HEIGHT}'
+OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+def post_image(post):
+    """Атрибуты <img> картинки поста или None, пока версий нет."""
+    renditions = post_renditions(post)
+    if renditions is None:
+        return None
+    width, height, src = min(
+        renditions, key=lambda rendition: abs(rendition[0] - WIDTH)
+    )
+    return {
+        'src': src,
+        'srcset': ', '.join(f'{url} {w}w' for w, _, url in renditions),
+        'sizes': settings.POST_IMAGE_SIZES,
+        'width': width,
+        'height': height,
+    }
+
+
+def post_thumbnail(post):
+    """URL основной миниатюры GEOMETRY картинки поста или None."""
+    for width, height, url in post_renditions(post) or ():
+        if (width, height) == (WIDTH, HEIGHT):
+            return url
+    return None
+
+
+def rendition_widths(name):
+    """Ширины версий картинки name: не шире исходника, плюс GEOMETRY."""
+    with storage.open(name) as file, Image.open(file) as image:
+        source_width = image.width
+    return sorted({
+        width for width in settings.POST_IMAGE_RENDITIONS
+        if width <= source_width
+    } | {WIDTH})
+
+
+def rendition_height(width):
+    return round(width * HEIGHT / WIDTH)
+
+
+def create_renditions(name):
+    """Создаёт версии картинки name: [ширина, высота, имя файла]."""
+    # Ключи KV-хранилища sorl зависят от хранилища исходника: оно то же,
+    # что у Post.image, иначе сборка мусора не найдёт миниатюры.
+    source = ImageFile(name, storage)
+    renditions = []
+    for width in rendition_widths(name):
+        geometry = f'{width}x{rendition_height(width)}'
+        thumbnail = get_thumbnail(source, geometry, **OPTIONS)
+        renditions.append([thumbnail.width, thumbnail.height, thumbnail.name])
+    return renditions
+
+
+def post_renditions(post):
+    """Записанные версии картинки поста [ширина, высота, url] или None."""
+    if not post.image or not post.image_renditions:
+        return None
+    record = json.loads(post.image_renditions)
+    # Запись от прежней картинки поста не подходит.
+    if record['image'] != post.image.name:
+        return None
+    return [
+        [width, height, default.storage.url(name)]
+        for width, height, name in record['renditions']
+    ]
+
+
+def check_settings():
+    """Фоновый режим требует кеша, общего для процессов.
+
+    generate выполняется в процессе runworker и сбрасывает поколения
+    кеша карточек и страниц; с кешем в памяти процесса веб-процессы
+    этого не увидят и сутки будут показывать заглушку.
+    """
+    if settings.THUMBNAIL_BACKGROUND and not is_shared_cache():
+        raise ImproperlyConfigured(
+            'THUMBNAIL_BACKGROUND требует кеша, общего для процессов: '
+            'задайте YATUBE_SHARED_CACHE_DIR или выключите фоновый режим.'
+        )
+
+
+@job(queue='thumbnails', unique=True)
+def generate(name):
+    """Создаёт миниатюры картинки name и записывает их в посты."""
+    renditions = create_renditions(name)
+    Post.objects.filter(image=name).update(image_renditions=json.dumps(
+        {'image': name, 'renditions': renditions}
+    ))
+    bump_cache_version(f'image:{name}')
+    # Страницы лент в кеше показывают заглушку вместо миниатюры.
+    bump_cache_version('index_page')
+
+
+def schedule(name):
+    """Ставит генерацию миниатюр name в очередь после коммита транзакции."""
+    if not name:
+        return
+    if settings.THUMBNAIL_BACKGROUND:
+        generate.enqueue(name)
+        return
+    try:
+        generate(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', name)
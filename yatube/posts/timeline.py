@@ -0,0 +1,244 @@
+"""Материализованная лента подписок (fan-out-on-write).
+
+Новый пост раскладывается в TimelineEntry каждому подписчику автора.
+Посты авторов, у которых подписчиков больше TIMELINE_FANOUT_LIMIT,
+не раскладываются и не записываются при чтении: home_timeline сливает
+страницу ленты со страницей их постов по индексу (MergedFeed).
+"""
+import heapq
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .following import contains, followed_ids
+from .models import Follow, Post, TimelineEntry, UserCounters
+
+CELEBRITIES_CACHE_KEY = 'timeline:celebrities'
+
+
+def _celebrities():
+    return UserCounters.objects.filter(
+        followers__gt=settings.TIMELINE_FANOUT_LIMIT
+    )
+
+
+def is_celebrity(author_id):
+    """Подписчиков у автора больше TIMELINE_FANOUT_LIMIT."""
+    return _celebrities().filter(user_id=author_id).exists()
+
+
+def celebrity_ids():
+    ids = cache.get(CELEBRITIES_CACHE_KEY)
+    if ids is None:
+        ids = set(_celebrities().values_list('user_id', flat=True))
+        cache.set(
+            CELEBRITIES_CACHE_KEY, ids, settings.TIMELINE_CELEBRITIES_TTL
+        )
+    return ids
+
+
+def _bulk_insert(entries):
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, settings.TIMELINE_BATCH_SIZE))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Раскладывает новый пост в ленты подписчиков автора."""
+    if is_celebrity(post.author_id):
+        if post.author_id not in celebrity_ids():
+            cache.delete(CELEBRITIES_CACHE_KEY)
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in followers.iterator()
+    )
+
+
+def fan_out_many(posts):
+    """fan_out для пачки постов: один запрос подписчиков на всю пачку."""
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    celebrities = set(_celebrities().filter(
+        user_id__in=by_author
+    ).values_list('user_id', flat=True))
+    followers = Follow.objects.filter(
+        author_id__in=by_author.keys() - celebrities
+    ).values_list('author_id', 'user_id')
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=author_id,
+            pub_date=post.pub_date,
+        )
+        for author_id, user_id in followers.iterator()
+        for post in by_author[author_id]
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date'
+    ).values_list('pk', 'pub_date')[:settings.TIMELINE_BACKFILL]
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in posts
+    )
+
+
+def backfill_many(pairs):
+    """backfill для пачки подписок (user_id, author_id).
+
+    Последние посты всех авторов пачки берутся одним запросом: ROW_NUMBER()
+    нумерует посты автора по индексу (author, pub_date), наружу отдаются
+    только первые TIMELINE_BACKFILL.
+    """
+    by_author = defaultdict(list)
+    for user_id, author_id in pairs:
+        by_author[author_id].append(user_id)
+    celebrities = set(_celebrities().filter(
+        user_id__in=by_author
+    ).values_list('user_id', flat=True))
+    authors = by_author.keys() - celebrities
+    if not authors:
+        return
+    ranked = Post.objects.filter(author_id__in=authors).annotate(
+        recency=Window(
+            RowNumber(),
+            partition_by=[F('author_id')],
+            order_by=F('pub_date').desc(),
+        )
+    ).values('pk', 'author_id', 'pub_date', 'recency')
+    sql, params = ranked.query.sql_with_params()
+    posts = Post.objects.raw(
+        f'SELECT * FROM ({sql}) AS ranked '
+        f'WHERE {connection.ops.quote_name("recency")} <= %s',
+        [*params, settings.TIMELINE_BACKFILL],
+    )
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for post in posts
+            for user_id in by_author[post.author_id]
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).delete()
+
+
+def followed_celebrities(user_id):
+    """Популярные авторы, на которых подписан user_id."""
+    ids = followed_ids(user_id)
+    return [
+        author_id for author_id in celebrity_ids()
+        if contains(ids, author_id)
+    ]
+
+
+class MergedFeed:
+    """Несколько querysets с одним порядком, слитые при чтении.
+
+    Поддерживает то, что нужно пагинаторам: order_by, filter,
+    select_related, срезы и count. Строки частей не должны совпадать.
+    Срез [a:b] читает из каждой части не больше b строк.
+    """
+
+    def __init__(self, *querysets):
+        self.querysets = querysets
+
+    def _apply(self, method, *args, **kwargs):
+        return MergedFeed(*(
+            getattr(queryset, method)(*args, **kwargs)
+            for queryset in self.querysets
+        ))
+
+    def order_by(self, *fields):
+        return self._apply('order_by', *fields)
+
+    def filter(self, *args, **kwargs):
+        return self._apply('filter', *args, **kwargs)
+
+    def select_related(self, *fields):
+        return self._apply('select_related', *fields)
+
+    @property
+    def ordered(self):
+        return all(queryset.ordered for queryset in self.querysets)
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError('MergedFeed поддерживает только срезы')
+        fields = self.querysets[0].query.order_by
+        names = [field.lstrip('-') for field in fields]
+        rows = heapq.merge(
+            *(queryset[:index.stop] for queryset in self.querysets),
+            key=lambda row: [getattr(row, name) for name in names],
+            reverse=fields[0].startswith('-'),
+        )
+        return list(islice(rows, index.start, index.stop))
+
+
+def home_timeline(user):
+    """Посты ленты подписок в порядке (timeline_date, timeline_id).
+
+    timeline_id — id поста: по нему записи ленты сливаются с постами
+    популярных авторов, которые в ленту не записываются.
+    """
+    timeline = Post.objects.filter(timeline_entries__user=user).annotate(
+        timeline_date=F('timeline_entries__pub_date'),
+        timeline_id=F('timeline_entries__post_id'),
+    ).order_by('-timeline_date', '-timeline_id')
+    celebrities = followed_celebrities(user.pk)
+    if not celebrities:
+        return timeline
+    # Записи, сделанные до того, как автор стал популярным.
+    timeline = timeline.exclude(author_id__in=celebrities)
+    return MergedFeed(timeline, Post.objects.filter(
+        author_id__in=celebrities
+    ).annotate(
+        timeline_date=F('pub_date'),
+        timeline_id=F('pk'),
+    ).order_by('-timeline_date', '-timeline_id'))
@@ -1,9 +1,135 @@
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 
 
-def paginator(object, request):
-    paginator = Paginator(object, settings.NUMBER_OF_POST)
+def encode_cursor(value, pk, number):
+    """Упаковывает ключ (дата, pk) и номер страницы в токен для URL."""
+    raw = f'{value.isoformat()}|{pk}|{number}'
+    return urlsafe_base64_encode(raw.encode())
+
+
+def decode_cursor(token):
+    """Распаковывает токен курсора, для повреждённого токена вернёт None."""
+    try:
+        value, pk, number = urlsafe_base64_decode(token).decode().split('|')
+        value = parse_datetime(value)
+        pk, number = int(pk), int(number)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+    if value is None:
+        return None
+    return value, pk, number
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (field, tiebreak) вместо OFFSET и COUNT(*).
+
+    Экземпляр обслуживает одну страницу: соседние страницы
+    адресуются токенами ?after= и ?before=, а номера (?page=N)
+    поддерживаются для первых PAGINATION_OFFSET_PAGES страниц.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, field='-pub_date',
+                 tiebreak='pk'):
+        super().__init__(object_list, per_page)
+        self.descending = field.startswith('-')
+        self.field = field.lstrip('-')
+        self.tiebreak = tiebreak
+        self.next_cursor = None
+        self.previous_cursor = None
+        self.number = 1
+        self.has_next = False
+
+    @property
+    def num_pages(self):
+        # Известна только текущая страница и наличие следующей.
+        return self.number + self.has_next
+
+    @property
+    def next_query(self):
+        return f'after={self.next_cursor}'
+
+    @property
+    def previous_query(self):
+        return f'before={self.previous_cursor}'
+
+    def _ordered(self, reverse=False):
+        prefix = '-' if self.descending != reverse else ''
+        return self.object_list.order_by(
+            f'{prefix}{self.field}', f'{prefix}{self.tiebreak}'
+        )
+
+    def _seek(self, value, pk, reverse=False):
+        lookup = 'lt' if self.descending != reverse else 'gt'
+        return self._ordered(reverse).filter(
+            Q(**{f'{self.field}__{lookup}': value})
+            | Q(**{self.field: value, f'{self.tiebreak}__{lookup}': pk})
+        )
+
+    def _cursor(self, obj, number):
+        return encode_cursor(
+            getattr(obj, self.field), getattr(obj, self.tiebreak), number
+        )
+
+    def _page(self, rows, number, has_next):
+        rows = rows[:self.per_page]
+        self.number, self.has_next = number, has_next
+        if rows:
+            self.next_cursor = self._cursor(rows[-1], number + 1)
+            self.previous_cursor = self._cursor(rows[0], number - 1)
+        return Page(rows, number, self)
+
+    def page_number(self, number):
+        offset = (number - 1) * self.per_page
+        rows = list(self._ordered()[offset:offset + self.per_page + 1])
+        if not rows and number > 1:
+            return self.page_number(1)
+        return self._page(rows, number, len(rows) > self.per_page)
+
+    def page_after(self, value, pk, number):
+        rows = list(self._seek(value, pk)[:self.per_page + 1])
+        if not rows:
+            # Строки за курсором удалены: первая страница здесь дала бы
+            # повторы в «Показать ещё».
+            return self._page([], 1, False)
+        return self._page(rows, max(number, 2), len(rows) > self.per_page)
+
+    def page_before(self, value, pk, number):
+        rows = list(self._seek(value, pk, reverse=True)[:self.per_page + 1])
+        if not rows:
+            return self._page([], 1, False)
+        if len(rows) <= self.per_page:
+            return self.page_number(1)
+        return self._page(rows[:self.per_page][::-1], max(number, 2), True)
+
+    def get_cursor_page(self, params):
+        """Возвращает страницу по параметрам запроса: after, before, page."""
+        for name, method in (('after', self.page_after),
+                             ('before', self.page_before)):
+            cursor = decode_cursor(params.get(name, ''))
+            if cursor is not None:
+                return method(*cursor)
+        try:
+            number = int(params.get('page', 1))
+        except (TypeError, ValueError):
+            number = 1
+        if not 1 <= number <= settings.PAGINATION_OFFSET_PAGES:
+            number = 1
+        return self.page_number(number)
+
+
+def paginator(object, request, field='-pub_date', per_page=None,
+              tiebreak='pk'):
+    per_page = per_page or settings.NUMBER_OF_POST
+    if settings.PAGINATION_MODE == 'cursor':
+        return CursorPaginator(
+            object, per_page, field, tiebreak
+        ).get_cursor_page(request.GET)
+    paginator = Paginator(object, per_page)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
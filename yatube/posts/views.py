@@ -1,13 +1,35 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import (
+    Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
-
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from core.cache import allow_read_your_writes, swr_cache_page
+from core.conditional import conditional_page
+
+from .conditional import (
+    group_state, index_state, post_detail_state, profile_state,
+)
+from .counters import get_counters
+from .exporter import (
+    CONTENT_TYPES, EXPORTS, FORMATS, byte_chunks, export_lines, parse_since,
+)
+from .following import is_following
 from .forms import CommentForm, PostForm
 from .models import Comment, Group, Follow, Post, User
-from .utils import paginator
+from .search import search_posts
+from .timeline import home_timeline
+from .utils import CursorPaginator, paginator
 
 
-@cache_page(20, key_prefix='index_page')
+@conditional_page(index_state)
+@swr_cache_page(settings.PAGE_CACHE_TIMEOUT, 'index', index_state)
 def index(request):
     posts = Post.objects.select_related('group', 'author')
     page_obj = paginator(posts, request)
@@ -17,6 +39,8 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page(group_state)
+@swr_cache_page(settings.PAGE_CACHE_TIMEOUT, 'group', group_state)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     posts = group.posts.select_related('group', 'author')
@@ -28,6 +52,8 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page(profile_state)
+@swr_cache_page(settings.PAGE_CACHE_TIMEOUT, 'profile', profile_state)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
     author_posts = author.posts.select_related('group', 'author')
@@ -35,42 +61,99 @@ def profile(request, username):
     following = (
         request.user.is_authenticated
         and author != request.user
-        and Follow.objects.filter(author=author, user=request.user).exists()
+        and is_following(request.user.pk, author.pk)
     )
     context = {
         'author': author,
+        'counters': get_counters(author),
         'page_obj': page_obj,
         'following': following,
     }
     return render(request, 'posts/profile.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    posts = search_posts(Post.objects.select_related('group', 'author'), query)
+    page_obj = Paginator(posts, settings.NUMBER_OF_POST).get_page(
+        request.GET.get('page')
+    )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@conditional_page(post_detail_state, last_modified=False)
 def post_detail(request, post_id):
     post = get_object_or_404(
         Post.objects.select_related('group', 'author'), id=post_id
     )
     form = CommentForm()
-    comment_post = Comment.objects.select_related('author')
+    # Всегда по курсору, как post_comments: «Показать ещё» продолжает
+    # с токена after= и в режиме PAGINATION_MODE='page'.
+    comment_post = CursorPaginator(
+        post.comments.select_related('author'),
+        settings.NUMBER_OF_COMMENTS, field='created',
+    ).get_cursor_page(request.GET)
     context = {
         'post': post,
+        'author_counters': get_counters(post.author),
         'form': form,
         'comment_post': comment_post,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Следующая порция комментариев поста в JSON для «Показать ещё»."""
+    post = get_object_or_404(Post.objects.only('pk'), id=post_id)
+    comments = CursorPaginator(
+        Comment.objects.filter(post=post).select_related('author'),
+        settings.NUMBER_OF_COMMENTS, field='created',
+    )
+    page_obj = comments.get_cursor_page(request.GET)
+    next_url = None
+    if page_obj.has_next():
+        next_url = '{}?{}'.format(
+            reverse('posts:post_comments', args=(post_id,)),
+            comments.next_query,
+        )
+    return JsonResponse({
+        'comments': [
+            {
+                'id': comment.pk,
+                'author': comment.author.username,
+                'author_url': reverse(
+                    'posts:profile', args=(comment.author.username,)
+                ),
+                'text': comment.text,
+                'created': comment.created.isoformat(),
+            }
+            for comment in page_obj
+        ],
+        'next': next_url,
+    })
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        form.save_m2m()
+        allow_read_your_writes(request)
         return redirect('posts:profile', username=request.user)
     return render(request, 'posts/create_post.html', {'form': form})
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(
         Post.objects.select_related('group', 'author'), id=post_id
@@ -83,11 +166,16 @@ def post_edit(request, post_id):
         files=request.FILES or None,)
     if not form.is_valid():
         return render(request, 'posts/create_post.html', {'form': form})
-    post = form.save()
+    post = form.save(commit=False)
+    # Не перезаписываем comments_count, изменённый параллельно.
+    post.save(update_fields=PostForm.Meta.fields)
+    form.save_m2m()
+    allow_read_your_writes(request)
     return redirect('posts:post_detail', post_id=post.id)
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -96,13 +184,16 @@ def add_comment(request, post_id):
         comment.author = request.user
         comment.post = post
         comment.save()
+        allow_read_your_writes(request)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator(posts, request)
+    posts = home_timeline(request.user).select_related('group', 'author')
+    page_obj = paginator(
+        posts, request, field='-timeline_date', tiebreak='timeline_id'
+    )
     context = {
         'page_obj': page_obj,
     }
@@ -110,15 +201,46 @@ def follow_index(request):
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     following = get_object_or_404(User, username=username)
     if request.user != following:
         Follow.objects.get_or_create(author=following, user=request.user)
+        allow_read_your_writes(request)
     return redirect('posts:profile', username=username)
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     following = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=following).delete()
+    allow_read_your_writes(request)
     return redirect('posts:profile', username=username)
+
+
+@staff_member_required
+def export(request, table):
+    """Потоковая выгрузка таблицы, параметры как у export_content."""
+    if table not in EXPORTS:
+        raise Http404
+    format = request.GET.get('format', 'ndjson')
+    if format not in FORMATS:
+        return HttpResponseBadRequest(f'Неизвестный формат: {format}')
+    try:
+        lines = export_lines(
+            table,
+            format=format,
+            since=parse_since(request.GET.get('since')),
+            after_id=int(request.GET.get('after_id', 0)),
+        )
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    gzip = request.GET.get('gzip') == '1'
+    filename = f'{table}.{format}' + ('.gz' if gzip else '')
+    response = StreamingHttpResponse(
+        byte_chunks(lines, gzip=gzip),
+        content_type='application/gzip' if gzip else CONTENT_TYPES[format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
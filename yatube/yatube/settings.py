@@ -24,15 +24,21 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'benchmarks.apps.BenchmarksConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    # Первой, чтобы время ответа включало остальные middleware
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Статика из STATIC_ROOT отдаётся до сессий и аутентификации
+    'core.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -42,7 +48,8 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени отрисовки для метрик
+        'BACKEND': 'core.template_backends.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -63,9 +70,58 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        # Тестовая база в файле, а не в памяти: у базы в памяти общий кеш
+        # соединений, и потоки обработчика задач (core.jobs) сразу падают
+        # с «database table is locked», не дожидаясь busy_timeout.
+        'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')},
+    },
+    # Реплика для чтения. Локально это второй файл SQLite, который
+    # обновляется командой sync_replica; без YATUBE_REPLICA_DB реплика
+    # выключена и указывает на основной файл.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get(
+            'YATUBE_REPLICA_DB', os.path.join(BASE_DIR, 'db.sqlite3')
+        ),
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Прагмы каждого соединения с SQLite (core.sqlite). Замер под нагрузкой
+# несколькими процессами: run_contention_benchmark.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    # мс ожидания блокировки до «database is locked»
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    # отрицательное значение — размер в КиБ, здесь 64 МиБ на соединение
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
 }
 
+READ_REPLICA_ENABLED = 'YATUBE_REPLICA_DB' in os.environ
+
+# Представления только на чтение, которые читают из реплики
+READ_REPLICA_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+    'posts:follow_index',
+    'posts:api_index',
+    'posts:api_group_list',
+    'posts:api_profile',
+    'posts:api_follow_index',
+)
+
+# Приложения, модели которых читаются из реплики. Сессии и
+# пользователь запроса всегда читаются из основной базы.
+READ_REPLICA_APPS = ('posts', 'auth')
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME':
@@ -90,7 +146,9 @@ LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Письма отправляются из очереди email, см. core.mail
+EMAIL_BACKEND = 'core.mail.QueuedEmailBackend'
+QUEUED_EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 LANGUAGE_CODE = 'ru'
@@ -99,6 +157,25 @@ TIME_ZONE = 'Asia/Istanbul'
 
 NUMBER_OF_POST: int = 10
 
+NUMBER_OF_COMMENTS: int = 20
+
+# 'cursor' — keyset-пагинация без COUNT(*), 'page' — классический Paginator
+PAGINATION_MODE = 'cursor'
+
+PAGINATION_OFFSET_PAGES: int = 5
+
+# Авторы с большим числом подписчиков читаются в ленту при запросе
+TIMELINE_FANOUT_LIMIT: int = 10000
+
+TIMELINE_BACKFILL: int = 100
+
+TIMELINE_BATCH_SIZE: int = 1000
+
+TIMELINE_CELEBRITIES_TTL: int = 60 * 10
+
+# Кеш множества авторов, на которых подписан пользователь (posts.following)
+FOLLOWING_CACHE_TIMEOUT: int = 60 * 60 * 24
+
 USE_I18N = True
 
 USE_L10N = True
@@ -109,14 +186,119 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+STATIC_ROOT = os.path.join(BASE_DIR, 'static_root')
+
+# collectstatic добавляет к именам хеш содержимого и пишет рядом сжатые
+# копии .gz и .br (brotli — если установлен пакет Brotli)
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+
+# Файлы меньше этого размера не сжимаются
+STATIC_COMPRESS_MIN_SIZE: int = 256
+
+# Время кеширования статики без хеша в имени, в секундах
+STATIC_MAX_AGE: int = 60
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загруженные картинки постов уменьшаются до этого размера по длинной
+# стороне и пересохраняются без метаданных (posts.images)
+POST_IMAGE_MAX_SIZE: int = 1920
+
+# 'WEBP' или 'JPEG'
+POST_IMAGE_FORMAT = 'WEBP'
+
+POST_IMAGE_QUALITY: int = 80
+
+# Сохранять ли исходный файл в POST_IMAGE_ORIGINALS_DIR
+POST_IMAGE_KEEP_ORIGINALS = False
+
+POST_IMAGE_ORIGINALS_DIR = 'posts/originals/'
+
+# Сколько секунд файл без ссылок хранится до удаления collect_media
+MEDIA_GC_GRACE: int = 24 * 60 * 60
+
+# Ширины версий картинки для srcset (не шире исходной картинки)
+POST_IMAGE_RENDITIONS = (320, 640, 960, 1920)
+
+# Ширина картинки на странице для атрибута sizes
+POST_IMAGE_SIZES = '(min-width: 1200px) 1110px, 100vw'
+
+# Миниатюры создаются в очереди thumbnails, а не при сохранении поста.
+# Нужен общий кеш (YATUBE_SHARED_CACHE_DIR), см. thumbnails.check_settings
+THUMBNAIL_BACKGROUND = 'YATUBE_SHARED_CACHE_DIR' in os.environ
+
+# Очереди фоновых задач (core.jobs) и сколько задач каждой выполняется
+# одновременно
+JOB_QUEUES = {
+    'default': 2,
+    'thumbnails': 2,
+    'email': 1,
+}
+
+JOB_MAX_ATTEMPTS: int = 5
+
+# Пауза перед повтором упавшей задачи, удваивается с каждой попыткой
+JOB_RETRY_DELAY: int = 10
+
+JOB_RETRY_MAX_DELAY: int = 60 * 60
+
+# Сколько секунд задача считается занятой обработчиком
+JOB_LEASE: int = 5 * 60
+
+JOB_POLL_INTERVAL: float = 1.0
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'KEY_PREFIX': 'index_page',
     }
 }
+
+# С YATUBE_SHARED_CACHE_DIR процессы делят файловый кеш в этом каталоге,
+# а перед ним у каждого процесса свой LRU на несколько секунд
+if 'YATUBE_SHARED_CACHE_DIR' in os.environ:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.TwoTierCache',
+            'OPTIONS': {
+                'SHARED': 'shared',
+                # секунды, сколько процесс может видеть чужое старое значение
+                'L1_TIMEOUT': 5,
+                'L1_MAX_ENTRIES': 1000,
+            },
+        },
+        'shared': {
+            # add и incr атомарны между процессами
+            'BACKEND': 'core.cache_backends.LockingFileBasedCache',
+            'LOCATION': os.environ['YATUBE_SHARED_CACHE_DIR'],
+            'KEY_PREFIX': 'index_page',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+    }
+
+# Кеш страниц главной, групп и профилей (core.cache.swr_cache_page).
+# Копия сбрасывается и изменением состояния страницы, поэтому срок длинный.
+PAGE_CACHE_TIMEOUT: int = 60 * 60 * 6
+
+# Сколько ещё отдавать устаревшую копию, пока её перестраивает другой запрос
+PAGE_CACHE_STALE_TIMEOUT: int = 60 * 60
+
+# Блокировка перестроения истекает сама, если запрос упал
+PAGE_CACHE_LOCK_TIMEOUT: int = 10
+
+# Сколько секунд ждать чужого перестроения, если копии нет совсем
+PAGE_CACHE_WAIT: float = 2.0
+
+# Насколько рано обновлять копию до истечения (XFetch), 0 — не раньше
+PAGE_CACHE_BETA: float = 1.0
+
+# Кеш отрисованных карточек постов, ключ меняется при правке поста,
+# имени автора или группы
+POST_CARD_CACHE_TIMEOUT: int = 60 * 60 * 24
+
+# Сколько секунд автор после записи видит страницы в обход кеша
+# и читает из основной базы, а не из реплики
+CACHE_BYPASS_SECONDS: int = 30